@@ -11,104 +11,504 @@ bl_info = {
 import bpy
 import os
 import json
-import requests
-import re
+import hashlib
 import threading
+import queue
 import time
 import logging # Import logging
+import logging.handlers
+import atexit
 import sys # Import sys
 from pathlib import Path
 import collections # Import collections for deque
-# Removed top-level imports for blender_voice_client and importlib
+import functools
+import itertools
+import ast
+import re
+import shutil
+import math
+import builtins
 
 # --- Logging Setup ---
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-log_file = Path(__file__).parent / 'articulate3d_addon.log' # Log file in project root
+_ADDON_DIR = Path(__file__).resolve().parent # Resolved once; every addon file path derives from it
+log_file = _ADDON_DIR / 'articulate3d_addon.log' # Log file in project root
+
+# Set ARTICULATE3D_DEBUG=1 to enable DEBUG logging and echo every log line to Blender's console
+_DEBUG = os.environ.get("ARTICULATE3D_DEBUG") == "1"
 
-# Configure root logger for console output (Blender's console)
-logging.basicConfig(level=logging.INFO, format=log_format, handlers=[logging.StreamHandler(sys.stdout)])
+# Console output (Blender's console).
+# Outside debug mode only warnings and errors are printed; update_console logs every status message,
+# and writing all of them to stdout is slow (especially on Windows).
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setLevel(logging.DEBUG if _DEBUG else logging.WARNING)
+console_handler.setFormatter(logging.Formatter(log_format))
 
 # Create a specific logger for this addon module
 logger = logging.getLogger("Articulate3DAddon")
-logger.setLevel(logging.INFO) # Ensure logger level is set
+logger.setLevel(logging.DEBUG if _DEBUG else logging.INFO) # Ensure logger level is set
+# Reloading the addon re-runs this module against the same logger object. Drop the previous load's
+# handlers (their queue has no listener any more) so lines aren't written once per reload.
+for stale_handler in list(logger.handlers):
+    logger.removeHandler(stale_handler)
+logger.addHandler(console_handler)
+logger.propagate = False # The console handler above prints; don't echo through the root logger as well
+
+class BufferedFileHandler(logging.FileHandler):
+    """FileHandler that batches writes, flushing once buffer_size bytes are pending or the oldest
+    unflushed record is flush_interval seconds old, instead of flushing after every record.
+    Records at flush_level or above are flushed immediately so errors reach disk before a crash.
+    When max_bytes is set the file is rotated like RotatingFileHandler, but the size is only
+    checked at flush time rather than with a seek/tell per record."""
+
+    def __init__(self, filename, mode='a', buffer_size=64 * 1024, flush_interval=2.0, flush_level=logging.ERROR,
+                 max_bytes=0, backup_count=0):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        super().__init__(filename, mode=mode, delay=True) # File is created on the first record
+
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size, encoding=self.encoding, errors=self.errors)
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._pending_bytes += len(msg)
+            if (record.levelno >= self.flush_level or self._pending_bytes >= self.buffer_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            super().flush()
+            self._pending_bytes = 0
+            self._last_flush = time.monotonic()
+            if self.max_bytes and self.stream is not None and self.stream.tell() >= self.max_bytes:
+                self.rollover()
+        finally:
+            self.release()
+
+    def rollover(self):
+        """Shift log -> log.1 -> log.2 ..., dropping the oldest, and start a fresh file."""
+        self.stream.close()
+        self.stream = None
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.baseFilename}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.baseFilename}.{i + 1}")
+            os.replace(self.baseFilename, f"{self.baseFilename}.1")
+        else:
+            open(self.baseFilename, 'w').close() # No backups wanted: just truncate
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers after flush_interval seconds without a record,
+    so buffered lines reach disk while the addon is idle without the main thread touching the file."""
 
-# Add file handler
+    def __init__(self, queue, *handlers, flush_interval=2.0, respect_handler_level=False):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    handler.flush()
+
+# Add file handler. Log calls only put records on log_queue; a QueueListener thread owns the
+# FileHandler, so disk writes never block Blender's main thread.
+# importlib.reload re-runs this module in the same namespace: stop the previous load's writer thread
+# and close its log file before replacing them, otherwise every reload leaks a file descriptor.
+if globals().get('log_listener') is not None and globals().get('_log_listener_running'):
+    log_listener.stop()
+if globals().get('file_handler') is not None:
+    file_handler.close()
+if 'stop_log_listener' in globals():
+    atexit.unregister(stop_log_listener)
+log_queue = queue.SimpleQueue() # Unbounded, lock-free put: a logging call can never block or drop a record
+file_handler = None
+log_listener = None
+_log_listener_running = False
 try:
-    file_handler = logging.FileHandler(log_file, mode='a') # Use append mode
+    file_handler = BufferedFileHandler(log_file, mode='a', max_bytes=5 * 1024 * 1024, backup_count=2) # Append, capped at ~15 MB across backups
     file_handler.setFormatter(logging.Formatter(log_format))
-    logger.addHandler(file_handler)
+    log_listener = FlushingQueueListener(log_queue, file_handler, flush_interval=file_handler.flush_interval,
+                                         respect_handler_level=True)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
     logger.info(f"--- Addon Log session started. Logging to {log_file} ---")
 except Exception as e:
     # Use root logger (prints to Blender console) if specific logger fails
     logging.error(f"Failed to set up file logging to {log_file}: {e}")
 
+def start_log_listener():
+    """Start writing queued log records to the log file (called from register)."""
+    global _log_listener_running
+    if log_listener and not _log_listener_running:
+        log_listener.start()
+        _log_listener_running = True
+
+def stop_log_listener():
+    """Flush queued log records to disk and stop the writer thread."""
+    global _log_listener_running
+    if log_listener and _log_listener_running:
+        log_listener.stop()
+        _log_listener_running = False
+    if file_handler:
+        file_handler.flush()
+
+atexit.register(stop_log_listener) # Blender may quit without calling unregister()
+
 # --- End Logging Setup ---
 
+# Make the addon directory importable once at load time rather than on every operator call
+if str(_ADDON_DIR) not in sys.path:
+    sys.path.insert(0, str(_ADDON_DIR))
+try:
+    import blender_voice_client
+except ImportError as e:
+    blender_voice_client = None
+    logger.error(f"Failed to import blender_voice_client: {e}")
+
+_ENV_PATH = _ADDON_DIR / '.env'
+_ENV_EXAMPLE_PATH = _ADDON_DIR / '.env.example'
+
+
+# Parsed .env contents, refreshed only when the file's mtime changes
+_env_cache = {"mtime": None, "lines": [], "data": {}}
+
+def load_env_file():
+    """Parse the .env file into _env_cache, re-reading it only if it changed on disk"""
+    mtime = _ENV_PATH.stat().st_mtime
+    if mtime != _env_cache["mtime"]:
+        lines = _ENV_PATH.read_text().splitlines()
+        data = {}
+        for line in lines:
+            key, sep, value = line.partition('=')
+            if sep and not key.lstrip().startswith('#'):
+                data[key.strip()] = value.strip()
+        _env_cache.update(mtime=mtime, lines=lines, data=data)
+    return _env_cache
+
+ENV_KEY_PLACEHOLDER = 'your_gemini_api_key_here' # Value shipped in .env.example
+
+def env_api_key(cached_only=False):
+    """Return GEMINI_API_KEY from .env, or None if it is missing or still the placeholder.
+
+    cached_only uses the last parse without a stat, for draw().
+    """
+    if cached_only:
+        data = _env_cache["data"]
+    else:
+        try:
+            data = load_env_file()["data"]
+        except FileNotFoundError:
+            return None
+    api_key = data.get("GEMINI_API_KEY")
+    return api_key if api_key and api_key != ENV_KEY_PLACEHOLDER else None
+
 # Function to update the .env file with the API key
+def write_env_file(content):
+    """Replace .env atomically, so a crash mid-write never leaves a truncated file behind."""
+    tmp_path = _ENV_PATH.with_name('.env.tmp')
+    try:
+        # Created owner-only since it holds the API key; then given .env's own mode, so a user's chmod survives
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding="utf-8") as tmp_file:
+            tmp_file.write(content)
+        try:
+            shutil.copymode(_ENV_PATH, tmp_path)
+        except FileNotFoundError:
+            pass # First write: keep 0600
+        os.replace(tmp_path, _ENV_PATH)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True) # Don't leave a half-written copy of the key behind
+        raise
+
 def update_env_file(api_key):
     """Update the .env file with the provided API key"""
-    env_path = Path(__file__).parent / '.env'
-    
-    # Create .env file from example if it doesn't exist
-    if not env_path.exists():
-        example_path = Path(__file__).parent / '.env.example'
-        if example_path.exists():
-            with open(example_path, 'r') as example, open(env_path, 'w') as env:
-                env.write(example.read())
-        else:
+    try:
+        env = load_env_file() # One stat; re-reads only if .env was changed or replaced outside Blender
+    except FileNotFoundError:
+        # Create .env file from example if it doesn't exist
+        try:
+            shutil.copyfile(_ENV_EXAMPLE_PATH, _ENV_PATH) # Kernel-side copy where the OS supports it
+        except FileNotFoundError:
             # Create a basic .env file
-            with open(env_path, 'w') as env:
-                env.write("# Articulate 3D Environment Configuration\n")
-                env.write("# Add your API keys below\n\n")
-                env.write("# Google Gemini API Key\n")
-                env.write(f"GEMINI_API_KEY={api_key}\n")
-                return
+            write_env_file(
+                "# Articulate 3D Environment Configuration\n"
+                "# Add your API keys below\n\n"
+                "# Google Gemini API Key\n"
+                f"GEMINI_API_KEY={api_key}\n"
+            )
+            return
+        env = load_env_file()
     
-    # Read the current .env file
-    with open(env_path, 'r') as file:
-        content = file.read()
+    if env["data"].get("GEMINI_API_KEY") == api_key:
+        return # Key unchanged on disk, nothing to write
     
-    # Update or add the GEMINI_API_KEY
-    if 'GEMINI_API_KEY=' in content:
-        # Replace the existing key
-        content = re.sub(r'GEMINI_API_KEY=.*', f'GEMINI_API_KEY={api_key}', content)
+    # Update or add the GEMINI_API_KEY line, leaving comments and other keys untouched
+    key_line = f"GEMINI_API_KEY={api_key}"
+    lines = env["lines"]
+    for i, line in enumerate(lines):
+        key, sep, _ = line.partition('=')
+        if sep and key.strip() == "GEMINI_API_KEY": # Same rule load_env_file parses with
+            lines[i] = key_line
+            break
     else:
-        # Add the key if it doesn't exist
-        content += f"\n# Google Gemini API Key\nGEMINI_API_KEY={api_key}\n"
+        lines.extend(["", "# Google Gemini API Key", key_line])
     
     # Write the updated content back to the file
-    with open(env_path, 'w') as file:
-        file.write(content)
+    write_env_file("\n".join(lines) + "\n")
+    env["data"]["GEMINI_API_KEY"] = api_key
+    env["mtime"] = _ENV_PATH.stat().st_mtime
+
+_entry_ids = itertools.count(1)
+
+class HistoryEntry:
+    """One row of command_history / starred_commands. Slots keep rows small and attribute reads in draw() cheap."""
+    __slots__ = ('entry_id', 'transcription', 'status', 'status_label', 'status_icon', 'script', 'timestamp', 'starred')
+
+    def __init__(self, transcription, status, script, timestamp=None, starred=False):
+        # Stable id for operators to refer to; unlike a deque index it survives maxlen eviction and deletes
+        self.entry_id = next(_entry_ids)
+        self.transcription = transcription
+        self.status = status
+        # Status never changes after creation, so build the panel label and icon once instead of on every redraw
+        self.status_label = f"({status})"
+        self.status_icon = "CHECKMARK" if 'Success' in status else "ERROR" if 'Error' in status or 'Failed' in status else "INFO"
+        self.script = script
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.starred = starred
+
+    def __repr__(self):
+        return (f"HistoryEntry(entry_id={self.entry_id!r}, transcription={self.transcription!r}, status={self.status!r}, "
+                f"timestamp={self.timestamp!r}, starred={self.starred!r})")
 
 # Global variables
 voice_client_thread = None
-script_queue = []
+SCRIPT_QUEUE_MAXLEN = 256 # Bounds memory if the main thread stalls; the oldest pending script is dropped first
+script_queue = collections.deque(maxlen=SCRIPT_QUEUE_MAXLEN) # Filled by the voice client thread, drained by execute_scripts_timer
 command_history = collections.deque(maxlen=20) # Main history (temporary)
 starred_commands = [] # Persistent starred commands list
 last_transcription = None
+_timer_registered = False # Tracks execute_scripts_timer registration without scanning Blender's timer list
 pending_transcriptions = {} # request_id: transcription mapping
+_script_in_flight = False # Set by a context request, cleared by the next script/error; speeds up the script timer
+
+# --- API Key Validation Cache ---
+KEY_VALIDATION_TTL = 300 # Seconds a successful key validation is trusted
+_key_validation_cache = {} # sha256(api_key) -> (is_valid, time.time() of the check)
+_KEY_CACHE_PATH = _ADDON_DIR / '.key_cache.json' # Lets a quick Blender restart skip re-validation
+_key_cache_loaded = False
+_requests = None # requests is slow to import and only needed for validation, so it is loaded on first use
+_http_session = None # Reused so repeated validations keep the connection alive
+KEY_VALIDATION_POLL_INTERVAL = 0.1 # Seconds between modal checks for the background validation result
+KEY_VALIDATION_TIMEOUT = (3, 5) # (connect, read) seconds for the validation request
+GEMINI_MODELS_URL = "https://generativelanguage.googleapis.com/v1beta/models" # Cheapest authenticated endpoint
+
+def get_http_session():
+    """Return the shared validation Session, importing requests the first time it is needed."""
+    global _requests, _http_session
+    if _http_session is None:
+        import requests
+        _requests = requests
+        _http_session = requests.Session()
+        _http_session.headers.update({
+            "User-Agent": f"Articulate3D/{'.'.join(map(str, bl_info['version']))}",
+            "Accept": "application/json",
+        })
+        _http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)) # Only ever talks to one host
+    return _http_session
+
+def close_http_session():
+    """Release the pooled validation connection (called from unregister)."""
+    global _http_session
+    if _http_session is not None:
+        _http_session.close()
+        _http_session = None
+
+def load_key_validation_cache():
+    """Merge validations persisted by a previous session into _key_validation_cache (first call only)."""
+    global _key_cache_loaded
+    if _key_cache_loaded:
+        return
+    _key_cache_loaded = True
+    try:
+        stored = json.loads(_KEY_CACHE_PATH.read_text())
+        for key_hash, (is_valid, checked_at) in stored.items():
+            _key_validation_cache.setdefault(key_hash, (bool(is_valid), float(checked_at)))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable key validation cache {_KEY_CACHE_PATH}: {e}")
+
+def save_key_validation_cache():
+    """Persist the still-fresh validations (key hashes only, never the keys themselves)."""
+    now = time.time()
+    fresh = {key_hash: entry for key_hash, entry in _key_validation_cache.items() if now - entry[1] < KEY_VALIDATION_TTL}
+    try:
+        _KEY_CACHE_PATH.write_text(json.dumps(fresh))
+    except OSError as e:
+        logger.warning(f"Could not save key validation cache to {_KEY_CACHE_PATH}: {e}")
+
+def hash_api_key(api_key):
+    # Keys are cached by hash so the plaintext key is never kept in memory or on disk here.
+    # Stripped so a pasted key with stray whitespace maps to the same entry check_api_key stores.
+    return hashlib.sha256(api_key.strip().encode()).hexdigest()
+
+def is_api_key_cached(api_key):
+    """Return True if the key passed validation within the last KEY_VALIDATION_TTL seconds."""
+    load_key_validation_cache()
+    cached = _key_validation_cache.get(hash_api_key(api_key))
+    # Wall-clock time rather than monotonic, since entries may come from a previous Blender session
+    return bool(cached and cached[0] and time.time() - cached[1] < KEY_VALIDATION_TTL)
+
+GEMINI_KEY_RE = re.compile(r'AIza[0-9A-Za-z_\-]{35}') # Shape of a Gemini API key, used with fullmatch
+
+def check_api_key(api_key):
+    """Checks if the provided Gemini API key is valid by making a simple request.
+
+    Returns an (is_valid, error_message) tuple. Does not touch bpy, so it is safe to run on a worker thread.
+    """
+    api_key = api_key.strip() # Pasted keys often carry a trailing newline/space; validate and send the same value
+    if is_api_key_cached(api_key):
+        return True, None
+    if not GEMINI_KEY_RE.fullmatch(api_key):
+        # Catches empty/truncated pastes without a round-trip to Google
+        return False, "API key format looks wrong (Gemini keys start with 'AIza' and are 39 characters)."
+    try:
+        session = get_http_session()
+    except ImportError as e:
+        logger.error(f"Cannot validate API key, requests is not installed: {str(e)}")
+        return False, f"Unexpected Error during API Key Validation: {e}"
+    try:
+        # stream=True: read only the status line and headers; the model list body is never downloaded on success.
+        # (connect, read) timeouts bound how long a flaky network can stall validation.
+        response = session.get(GEMINI_MODELS_URL, params={"key": api_key}, timeout=KEY_VALIDATION_TIMEOUT, stream=True)
+        try:
+            if response.status_code == 200:
+                _key_validation_cache[hash_api_key(api_key)] = (True, time.time())
+                save_key_validation_cache()
+                return True, None
+            # Only the (small) error body is worth reading, for Google's explanation of the failure
+            try:
+                error_msg = response.json().get('error', {}).get('message') or response.reason or 'Unknown API error'
+            except ValueError:
+                error_msg = response.reason or 'Unknown API error'
+        finally:
+            response.close() # Return the pooled connection without draining the body
+        logger.error(f"API key validation failed: {error_msg} (Status code: {response.status_code})")
+        return False, f"API Key Validation Failed: {error_msg}"
+    except _requests.exceptions.Timeout as e:
+        logger.error(f"API key validation timed out: {str(e)}")
+        return False, "API Key Validation timed out. Check your internet connection and try again."
+    except _requests.exceptions.RequestException as e:
+        logger.error(f"API key validation failed due to network error: {str(e)}")
+        return False, f"Network Error during API Key Validation: {e}"
+    except Exception as e:
+        logger.error(f"Unexpected error during API key validation: {str(e)}")
+        return False, f"Unexpected Error during API Key Validation: {e}"
+
+def probe_api_key(api_key, result_queue):
+    """Worker thread target: validate the key off Blender's UI thread and post the result."""
+    result_queue.put(check_api_key(api_key))
 
 # --- Helper Functions ---
-def find_history_entry_by_timestamp(timestamp):
-    """Find index of an entry in command_history by timestamp."""
-    for i, entry in enumerate(command_history):
-        if entry.get('timestamp') == timestamp:
-            return i
-    return -1
-
-def find_starred_entry_by_timestamp(timestamp):
-    """Find index of an entry in starred_commands by timestamp."""
-    for i, entry in enumerate(starred_commands):
-        if entry.get('timestamp') == timestamp:
-            return i
-    return -1
+HISTORY_VISIBLE_ROWS = 5 # History rows drawn at once; the panel scrolls through the rest
+
+# Bumped on every command_history append/delete so the panel can reuse its row tuple between redraws
+_history_version = 0
+_history_rows_cache = {"version": -1, "rows": ()}
+_history_by_id = {} # entry_id -> entry for everything currently in command_history
+
+def add_history_entry(entry):
+    global _history_version
+    if len(command_history) == command_history.maxlen:
+        _history_by_id.pop(command_history[0].entry_id, None) # About to be evicted by maxlen
+    command_history.append(entry)
+    _history_by_id[entry.entry_id] = entry
+    _history_version += 1
+
+def remove_history_entry(entry_id):
+    """Delete the entry with this id from command_history and return it, or None if it is already gone."""
+    global _history_version
+    entry = _history_by_id.pop(entry_id, None)
+    if entry is not None:
+        command_history.remove(entry) # In place: no list copy or deque rebuild
+        _history_version += 1
+    return entry
+
+def newest_history_rows():
+    """command_history entries newest first; rebuilt only after the history changes."""
+    if _history_rows_cache["version"] != _history_version:
+        _history_rows_cache["rows"] = tuple(reversed(command_history))
+        _history_rows_cache["version"] = _history_version
+    return _history_rows_cache["rows"]
+
+_starred_by_id = {} # entry_id -> entry for everything in starred_commands
+
+def add_starred_entry(entry):
+    starred_commands.append(entry)
+    _starred_by_id[entry.entry_id] = entry
+
+def remove_starred_entry(entry_id):
+    """Remove the starred entry with this id and return it, or None if it isn't starred."""
+    entry = _starred_by_id.pop(entry_id, None)
+    if entry is not None:
+        starred_commands.remove(entry)
+    return entry
+
+def lookup_entry(entry_id):
+    """Return the history entry with this id, falling back to starred_commands once it has left the history."""
+    entry = _history_by_id.get(entry_id)
+    if entry is None:
+        entry = _starred_by_id.get(entry_id)
+    return entry
+
+# --- API Key Debounce ---
+_pending_env_key = None # Last typed API key waiting to be written to .env
+ENV_WRITE_DELAY = 0.5 # Seconds of typing inactivity before the .env file is written
+
+def flush_pending_env_write():
+    """Write the pending API key to .env. Also used as a one-shot timer callback."""
+    global _pending_env_key
+    if _pending_env_key is not None:
+        api_key, _pending_env_key = _pending_env_key, None
+        try:
+            update_env_file(api_key)
+        except Exception as e:
+            logger.error(f"Error writing API key to .env: {str(e)}")
+    return None # Returning None unregisters the timer
+
+def schedule_env_write(self, context):
+    """api_key update callback: restart the debounce timer so only the final key is written"""
+    global _pending_env_key
+    _pending_env_key = self.api_key
+    if bpy.app.timers.is_registered(flush_pending_env_write):
+        bpy.app.timers.unregister(flush_pending_env_write)
+    bpy.app.timers.register(flush_pending_env_write, first_interval=ENV_WRITE_DELAY)
 
 # --- Property Group ---
 class VoiceCommandProperties(bpy.types.PropertyGroup):
     is_listening: bpy.props.BoolProperty(name="Is Listening", default=False)
     api_key: bpy.props.StringProperty(
         name="API Key", description="Your Google Gemini API Key",
-        default="", subtype='PASSWORD', update=lambda self, context: update_env_file(self.api_key)
+        default="", subtype='PASSWORD', update=schedule_env_write
     )
     selected_model: bpy.props.EnumProperty(
         items=[
@@ -131,265 +531,503 @@ class VoiceCommandProperties(bpy.types.PropertyGroup):
     console_output: bpy.props.StringProperty(name="Console Output", default="Ready...", maxlen=1024)
     show_history: bpy.props.BoolProperty(name="Show Command History", default=True)
     show_starred: bpy.props.BoolProperty(name="Show Starred Commands", default=False)
+    show_help: bpy.props.BoolProperty(name="Show Voice Command Examples", default=False)
+    history_scroll_offset: bpy.props.IntProperty(name="History Scroll Offset", default=0, min=0) # First visible row, newest first
 
 # --- Core Functions ---
-def update_console(context, text):
-    props = context.scene.voice_command_props
-    props.console_output = text
-    logger.info(text)
+# Console writes invalidate the panel, so repeats are dropped and bursts are coalesced:
+# at most one write per CONSOLE_MIN_INTERVAL, with the latest text flushed by a timer.
+CONSOLE_MIN_INTERVAL = 0.05
+CONSOLE_FLUSH_INTERVAL = 0.1
+_console_state = {"shown": "", "pending": None, "t": 0.0}
+_console_lock = threading.Lock() # "pending" is handed from the client thread to the main thread
+
+def write_console(scene, text):
+    scene.voice_command_props.console_output = text
+    _console_state["shown"] = text
+    _console_state["t"] = time.monotonic()
+
+def flush_console(scene):
+    """Write the latest pending console text, if any. Main thread only."""
+    with _console_lock:
+        text, _console_state["pending"] = _console_state["pending"], None
+    if text is not None and text != _console_state["shown"]:
+        write_console(scene, text)
+
+def flush_console_timer():
+    flush_console(bpy.context.scene)
+    return None # One-shot
+
+def update_console(context, text, level=logging.INFO):
+    logger.log(level, text) # Every message is still logged, only the UI write is throttled
+    if threading.current_thread() is not threading.main_thread():
+        # Voice client thread: neither the property nor bpy.app.timers may be touched here.
+        # execute_scripts_timer flushes the text on the main thread; a pending error isn't
+        # replaced by a later status line before it has been shown.
+        with _console_lock:
+            pending = _console_state["pending"]
+            if pending is None or "Error" not in pending or "Error" in text:
+                _console_state["pending"] = text
+        return
+    if "Error" in text:
+        # Errors bypass the throttle so they are never hidden behind a pending status line
+        with _console_lock:
+            _console_state["pending"] = None
+        if text != _console_state["shown"]:
+            write_console(context.scene, text)
+        return
+    if _console_state["pending"] is None:
+        if text == _console_state["shown"]:
+            return
+        if time.monotonic() - _console_state["t"] >= CONSOLE_MIN_INTERVAL:
+            write_console(context.scene, text)
+            return
+    with _console_lock:
+        _console_state["pending"] = text
+    if not bpy.app.timers.is_registered(flush_console_timer):
+        bpy.app.timers.register(flush_console_timer, first_interval=CONSOLE_FLUSH_INTERVAL)
+
+def handle_request_context(context, message, status, msg_text, request_id):
+    # Server is asking for context for a voice command
+    global _script_in_flight
+    _script_in_flight = True
+    logger.info("Received context request %s: %s", request_id, msg_text)
+    update_console(context, f"Server: {msg_text}") # Show transcription/status
+
+    # Store the transcription text associated with this request ID
+    if request_id and msg_text:
+        # Clean up the message text to get the core transcription
+        cleaned_transcription = msg_text.replace("Processing audio command with Gemini...", "").replace("Transcribed command (Whisper):", "").replace("Transcribed command (Google STT):", "").strip()
+        if cleaned_transcription:
+             pending_transcriptions[request_id] = cleaned_transcription
+             logger.debug("Stored transcription for %s: '%s'", request_id, cleaned_transcription)
+        else:
+             logger.warning(f"Could not extract clean transcription from context request message for {request_id}: {msg_text}")
+             pending_transcriptions[request_id] = f"Voice Command ({request_id})" # Fallback
 
-def handle_script(context, script):
+    # Immediately gather and send context back
     try:
-        script_queue.append(script)
-        update_console(context, f"Received script to execute")
+        context_dict = blender_voice_client.get_blender_context()
+        blender_voice_client.send_context_response(request_id, context_dict)
+        logger.debug("Sent context response for %s", request_id)
     except Exception as e:
-        logger.error(f"Error handling script: {str(e)}", exc_info=True)
-        update_console(context, f"Error handling script: {str(e)}")
-
-import json # Add json import for safe string conversion
+        logger.error(f"Failed to send context response for {request_id}: {e}")
+        update_console(context, f"Error sending context: {e}")
+
+def handle_transcribed(context, message, status, msg_text, request_id):
+    global last_transcription
+    last_transcription = msg_text.replace("Transcribed: ", "").strip()
+    update_console(context, f"Server: {msg_text}")
+
+def handle_script_message(context, message, status, msg_text, request_id):
+    global _script_in_flight
+    _script_in_flight = False
+    script_content = message.get("script", "")
+    original_text = message.get("original_text") # Text from edited command (e.g., direct text input)
+    command_text = "Unknown Command" # Default
+
+    # Determine the source description for the history
+    if original_text:
+        command_text = original_text # Prefer text command origin if available
+    elif request_id in pending_transcriptions:
+        command_text = pending_transcriptions.pop(request_id) # Retrieve and remove stored transcription
+        logger.debug("Retrieved transcription for %s: '%s'", request_id, command_text)
+    elif request_id:
+        command_text = f"Voice Command ({request_id})" # Fallback if ID exists but no transcription was stored
+        logger.warning(f"No pending transcription found for script request {request_id}. Using fallback.")
+    elif pending_transcriptions:
+        # blender_voice_client forwards scripts without their request_id; the server answers
+        # requests in order, so this script belongs to the oldest pending transcription
+        request_id = next(iter(pending_transcriptions))
+        command_text = pending_transcriptions.pop(request_id)
+        logger.debug("Matched script without request_id to oldest pending request %s: '%s'", request_id, command_text)
+    else:
+         logger.error("Received script message with neither original_text nor request_id.")
+         command_text = "Unknown Script Source" # Absolute fallback
+
+    # Process the script (or lack thereof)
+    if script_content:
+        # This runs on the voice client's receive thread: parse/compile here so the
+        # timer on the main thread only has to run the cached result
+        prepare_script(script_content)
+        dropped_note = ""
+        if len(script_queue) >= SCRIPT_QUEUE_MAXLEN:
+            dropped_text = drop_oldest_script()
+            if dropped_text is not None:
+                dropped_note = f" Queue full: dropped '{dropped_text}'."
+        # Queue script, transcription, AND request_id
+        script_queue.append((script_content, command_text, request_id)) # execute_scripts_timer picks it up on the main thread
+        update_console(context, f"Received script for '{command_text}' - queued.{dropped_note}")
+    else:
+        # Script generation failed on the server side
+        logger.warning(f"Received script message status but no script content for '{command_text}' (Request ID: {request_id}).")
+        update_console(context, f"Script generation failed for '{command_text}'.")
+        # Log failed attempt to history
+        add_history_entry(HistoryEntry(command_text, 'Failed Generation', None))
+        # Clean up pending transcription if it somehow still exists for this ID
+        pending_transcriptions.pop(request_id, None)
+
+def drop_oldest_script():
+    """Make room in a full script_queue, recording the dropped command instead of letting deque's maxlen
+    discard it silently. Returns the dropped command's text, or None if the queue drained meanwhile."""
+    try:
+        dropped_script, dropped_text, dropped_request_id = script_queue.popleft()
+    except IndexError:
+        return None # The timer drained the queue in the meantime
+    logger.warning("Script queue full (%d); dropped oldest command '%s' (Request ID: %s)",
+                   SCRIPT_QUEUE_MAXLEN, dropped_text, dropped_request_id)
+    # Keep the script so it can still be re-run from history
+    add_history_entry(HistoryEntry(dropped_text, 'Dropped (Queue Full)', dropped_script))
+    return dropped_text
+
+def handle_server_error(context, message, status, msg_text, request_id):
+    global _script_in_flight
+    _script_in_flight = False
+    error_msg = f"Server Error: {msg_text}"
+    # Attempt to link error back to a pending transcription if possible
+    linked_transcription = "Unknown Command"
+    if request_id and request_id in pending_transcriptions:
+        linked_transcription = pending_transcriptions.pop(request_id) # Retrieve and remove
+        logger.debug("Retrieved transcription for error message %s: '%s'", request_id, linked_transcription)
+    elif request_id:
+        linked_transcription = f"Voice Command ({request_id})" # Fallback
+    logger.error(error_msg)
+    update_console(context, error_msg)
+    # Log error to history, using the linked transcription if found
+    entry = HistoryEntry(linked_transcription, 'Server Error', None)
+    add_history_entry(entry)
+    logger.debug("Appended server error to command_history: %s", entry)
+
+def handle_server_status(context, message, status, msg_text, request_id):
+    logger.info("Received status '%s': %s", status, msg_text)
+    update_console(context, f"Server: {msg_text}")
+
+def handle_unhandled_status(context, message, status, msg_text, request_id):
+    logger.warning(f"Received message with unhandled status: {status}")
+    update_console(context, f"Server: {msg_text}")
+
+# Server status -> handler, so each message costs one dict lookup instead of a chain of string compares
+_STATUS_HANDLERS = {
+    "request_context": handle_request_context,
+    "transcribed": handle_transcribed,
+    "script": handle_script_message,
+    "error": handle_server_error,
+    "info": handle_server_status,
+    "ready": handle_server_status,
+    "stopped": handle_server_status,
+}
 
 def process_voice_client_message(context, message):
-    global last_transcription, command_history, pending_transcriptions # Added pending_transcriptions
     try:
-        # Ensure message is logged safely as a string
-        log_message_str = json.dumps(message) if isinstance(message, dict) else str(message)
-        logger.debug(f"Processing message: {log_message_str[:500]}") # Log truncated message safely
+        if logger.isEnabledFor(logging.DEBUG):
+            # Ensure message is logged safely as a string; skip the dump entirely when DEBUG is off
+            log_message_str = json.dumps(message) if isinstance(message, dict) else str(message)
+            logger.debug("Processing message: %s", log_message_str[:500]) # Log truncated message safely
 
-        if isinstance(message, str):
-            update_console(context, message)
-        elif isinstance(message, dict):
+        message_type = type(message)
+        if message_type is dict:
             status = message.get("status", "unknown")
-            msg_text = message.get("message", "No message content.")
-            request_id = message.get("request_id") # Get request ID if present
-
-            if status == "request_context":
-                # Server is asking for context for a voice command
-                logger.info(f"Received context request {request_id}: {msg_text}")
-                update_console(context, f"Server: {msg_text}") # Show transcription/status
-
-                # Store the transcription text associated with this request ID
-                if request_id and msg_text:
-                    # Clean up the message text to get the core transcription
-                    cleaned_transcription = msg_text.replace("Processing audio command with Gemini...", "").replace("Transcribed command (Whisper):", "").replace("Transcribed command (Google STT):", "").strip()
-                    if cleaned_transcription:
-                         pending_transcriptions[request_id] = cleaned_transcription
-                         logger.debug(f"Stored transcription for {request_id}: '{cleaned_transcription}'")
-                    else:
-                         logger.warning(f"Could not extract clean transcription from context request message for {request_id}: {msg_text}")
-                         pending_transcriptions[request_id] = f"Voice Command ({request_id})" # Fallback
-
-                # Immediately gather and send context back
-                try:
-                    import sys, os
-                    addon_dir = os.path.dirname(os.path.abspath(__file__))
-                    if addon_dir not in sys.path: sys.path.insert(0, addon_dir)
-                    import blender_voice_client
-                    context_dict = blender_voice_client.get_blender_context()
-                    blender_voice_client.send_context_response(request_id, context_dict)
-                    logger.debug(f"Sent context response for {request_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send context response for {request_id}: {e}", exc_info=True)
-                    update_console(context, f"Error sending context: {e}")
-
-            elif status == "transcribed":
-                last_transcription = msg_text.replace("Transcribed: ", "").strip()
-                update_console(context, f"Server: {msg_text}")
-            elif status == "script":
-                script_content = message.get("script", "")
-                original_text = message.get("original_text") # Text from edited command (e.g., direct text input)
-                command_text = "Unknown Command" # Default
-
-                # Determine the source description for the history
-                if original_text:
-                    command_text = original_text # Prefer text command origin if available
-                elif request_id in pending_transcriptions:
-                    command_text = pending_transcriptions.pop(request_id) # Retrieve and remove stored transcription
-                    logger.debug(f"Retrieved transcription for {request_id}: '{command_text}'")
-                elif request_id:
-                    command_text = f"Voice Command ({request_id})" # Fallback if ID exists but no transcription was stored
-                    logger.warning(f"No pending transcription found for script request {request_id}. Using fallback.")
-                else:
-                     logger.error("Received script message with neither original_text nor request_id.")
-                     command_text = "Unknown Script Source" # Absolute fallback
-
-                # Process the script (or lack thereof)
-                if script_content:
-                    # Queue script, transcription, AND request_id
-                    script_queue.append((script_content, command_text, request_id))
-                    update_console(context, f"Received script for '{command_text}' - queued.")
-                else:
-                    # Script generation failed on the server side
-                    logger.warning(f"Received script message status but no script content for '{command_text}' (Request ID: {request_id}).")
-                    update_console(context, f"Script generation failed for '{command_text}'.")
-                    # Log failed attempt to history
-                    entry = {
-                        'transcription': command_text, # Use the determined command_text
-                        'status': 'Failed Generation',
-                        'script': None, 'timestamp': time.time(), 'starred': False
-                    }
-                    command_history.append(entry)
-                    # Clean up pending transcription if it somehow still exists for this ID
-                    if request_id in pending_transcriptions:
-                        del pending_transcriptions[request_id]
-
-
-            elif status == "error":
-                error_msg = f"Server Error: {msg_text}"
-                # Attempt to link error back to a pending transcription if possible
-                linked_transcription = "Unknown Command"
-                if request_id and request_id in pending_transcriptions:
-                    linked_transcription = pending_transcriptions.pop(request_id) # Retrieve and remove
-                    logger.debug(f"Retrieved transcription for error message {request_id}: '{linked_transcription}'")
-                elif request_id:
-                    linked_transcription = f"Voice Command ({request_id})" # Fallback
-                logger.error(error_msg)
-                update_console(context, error_msg)
-                # Log error to history, using the linked transcription if found
-                entry = {
-                    'transcription': linked_transcription,
-                    'status': 'Server Error',
-                    'script': None, 'timestamp': time.time(), 'starred': False
-                }
-                command_history.append(entry)
-                logger.debug(f"Appended server error to command_history: {entry}")
-
-
-            elif status in ["info", "ready", "stopped"]:
-                 logger.info(f"Received status '{status}': {msg_text}")
-                 update_console(context, f"Server: {msg_text}")
-            else:
-                logger.warning(f"Received message with unhandled status: {status}")
-                update_console(context, f"Server: {msg_text}")
+            handler = _STATUS_HANDLERS.get(status, handle_unhandled_status)
+            handler(context, message, status, message.get("message", "No message content."), message.get("request_id"))
+        elif message_type is str:
+            update_console(context, message)
         else:
-            logger.warning(f"Received unexpected message format: {type(message)} - {message}")
+            logger.warning(f"Received unexpected message format: {message_type} - {message}")
             update_console(context, str(message))
     except Exception as e:
             # Log the raw error details for better debugging
             ui_error_msg = f"Error processing message: {str(e)}"
-            logger.error(f"Error processing message: {str(e)}. Raw message: {log_message_str[:500]}", exc_info=True)
+            logger.error("Error processing message: %s. Raw message: %.500s", e, message)
             update_console(context, ui_error_msg)
 
-def execute_scripts_timer():
-    global command_history
-    context = bpy.context
-    needs_redraw = False
-    if script_queue:
-        popped_item = None # Initialize to None
-        try:
-            # --- Wrap the pop operation in a try/except ---
-            popped_item = script_queue.pop(0)
-        except IndexError:
-            # This handles the case where the queue becomes empty between the 'if script_queue:' check and the pop attempt.
-            logger.debug("execute_scripts_timer: Queue was empty when pop was attempted (potential race condition).")
-            return 1.0 # Return timer interval even if nothing was processed this cycle
-
-        # If pop was successful, proceed
-        if popped_item:
-            script_to_execute, transcription, original_request_id = popped_item # Unpack here
-            logger.debug(f"Dequeued script for transcription: '{transcription}' -- Request ID immediately after pop: {original_request_id}") # Log the unpacked ID
-            status = 'Unknown'
-            entry_timestamp = time.time()
-        try:
-            # Log context before execution
-            logger.info(f"Context before exec: area={context.area.type if context.area else 'None'}, window={context.window.screen.name if context.window else 'None'}, mode={context.mode if hasattr(context, 'mode') else 'N/A'}")
-            update_console(context, f"Executing script for: {transcription}")
+# Globals every generated script starts with. Copied per run (a dict copy is cheap) so one script's
+# variables can't leak into the next, while skipping the per-exec __builtins__ setup.
+SCRIPT_GLOBALS = {"bpy": bpy, "math": math, "__builtins__": builtins}
 
-            # Execute the script directly
-            exec(script_to_execute, {"bpy": bpy})
+@functools.lru_cache(maxsize=128)
+def compile_script(script):
+    """Compile a generated script once; repeated commands reuse the cached code object."""
+    return compile(script, '<voice>', 'exec')
 
-            status = 'Success'
-            update_console(context, f"Script for '{transcription}' executed successfully.")
-        except Exception as e:
-            status = 'Script Error'
-            error_type = type(e).__name__
-            error_message = str(e)
-            # Removed exception attribute logic, use original_request_id directly
-            ui_error_msg = f"Script Execution Error for '{transcription}': {error_type} - {error_message}"
-            # Log detailed traceback using the ID from the original tuple (original_request_id)
-            logger.error(f"Script Execution Error for '{transcription}' (Request ID: {original_request_id}):", exc_info=True)
-            update_console(context, ui_error_msg)
+@functools.lru_cache(maxsize=128)
+def lower_script(script):
+    """Recognise scripts that are just a single bpy.ops call with literal arguments.
+
+    Returns (operator_path, args, kwargs) so the operator can be called directly,
+    or None if the script needs the general exec() path.
+    """
+    try:
+        tree = ast.parse(script)
+    except SyntaxError:
+        return None # Let compile_script raise the real error
+    call = None
+    for node in tree.body:
+        if isinstance(node, ast.Import) and all(alias.name == 'bpy' and alias.asname is None for alias in node.names):
+            continue
+        if call is None and isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            call = node.value
+            continue
+        return None
+    if call is None:
+        return None
+
+    # Only bpy.ops.<module>.<operator>(...) qualifies
+    op_path = []
+    func = call.func
+    while isinstance(func, ast.Attribute):
+        op_path.append(func.attr)
+        func = func.value
+    op_path.reverse()
+    if not (isinstance(func, ast.Name) and func.id == 'bpy') or len(op_path) != 3 or op_path[0] != 'ops':
+        return None
+
+    try:
+        args = tuple(ast.literal_eval(arg) for arg in call.args)
+        kwargs = {}
+        for keyword in call.keywords:
+            if keyword.arg is None: # **kwargs unpacking
+                return None
+            kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+    except (ValueError, TypeError, SyntaxError):
+        return None # Arguments computed at runtime (e.g. math.radians(45))
+    return tuple(op_path), args, kwargs
+
+def run_script(script):
+    """Run a generated script, calling single bpy.ops commands directly and exec'ing everything else."""
+    lowered = lower_script(script)
+    if lowered is not None:
+        op_path, args, kwargs = lowered
+        functools.reduce(getattr, op_path, bpy)(*args, **kwargs)
+    else:
+        exec(compile_script(script), SCRIPT_GLOBALS.copy())
 
-            # --- Send error back to server ---
+def prepare_script(script):
+    """Warm the lower/compile caches for a script. Touches no bpy state, so it is safe off the main thread."""
+    try:
+        if lower_script(script) is None:
+            compile_script(script)
+    except SyntaxError:
+        pass # Reported when the script actually runs on the main thread
+
+def execute_queued_script(context, script_to_execute, transcription, original_request_id):
+    """Execute one dequeued script and record the outcome in command_history."""
+    logger.debug("Dequeued script for transcription: '%s' -- Request ID immediately after pop: %s", transcription, original_request_id) # Log the unpacked ID
+    status = 'Unknown'
+    entry_timestamp = time.time()
+    try:
+        # Log context before execution (walks several RNA attributes, so only when DEBUG is on)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Context before exec: area=%s, window=%s, mode=%s",
+                         context.area.type if context.area else 'None',
+                         context.window.screen.name if context.window else 'None',
+                         getattr(context, 'mode', 'N/A'))
+        update_console(context, f"Executing script for: {transcription}", logging.DEBUG)
+
+        run_script(script_to_execute)
+
+        status = 'Success'
+        update_console(context, f"Script for '{transcription}' executed successfully.", logging.DEBUG)
+    except Exception as e:
+        status = 'Script Error'
+        error_type = type(e).__name__
+        error_message = str(e)
+        # Removed exception attribute logic, use original_request_id directly
+        ui_error_msg = f"Script Execution Error for '{transcription}': {error_type} - {error_message}"
+        # Log detailed traceback using the ID from the original tuple (original_request_id)
+        logger.error("Script Execution Error for '%s' (Request ID: %s):", transcription, original_request_id, exc_info=True)
+        update_console(context, ui_error_msg)
+
+        # --- Send error back to server ---
+        try:
+            if hasattr(blender_voice_client, 'send_execution_error'):
+                # Use the original_request_id variable directly
+                logger.debug("Value of original_request_id JUST BEFORE sending error: %s", original_request_id)
+                logger.info("Sending execution error details back to server for request %s...", original_request_id)
+                blender_voice_client.send_execution_error(original_request_id, error_type, error_message)
+            else:
+                # This case should ideally not happen if client is updated
+                logger.warning("blender_voice_client.send_execution_error function not found.")
+        except Exception as send_err:
+            logger.error("Failed to send execution error to server: %s", send_err)
+        # --- End error sending ---
+
+    # Always add to history
+    entry = HistoryEntry(transcription, status, script_to_execute, entry_timestamp) # New entries are never starred
+    add_history_entry(entry)
+    logger.debug("Appended to command_history: %s", entry)
+
+def tag_ui_redraw(context):
+    """Tag the addon's sidebar regions for redraw."""
+    area = context.area
+    if area is not None and area.type == 'VIEW_3D':
+        # Operator clicked in a sidebar: that sidebar is the one showing the change
+        for region in area.regions:
+            if region.type == 'UI':
+                region.tag_redraw()
+                return
+    # Walked on every call: Region references can't be cached safely across area splits and joins
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                for region in area.regions:
+                    if region.type == 'UI':
+                        region.tag_redraw()
+
+SCRIPT_TICK_BUDGET = 0.05 # Seconds of script execution allowed per timer tick
+SCRIPT_TICK_MAX = 8 # Scripts run per tick even when each one is fast, so UI events still get a turn
+# Adaptive poll: back off while nothing is expected, poll quickly once the server is working on a command
+SCRIPT_IDLE_INTERVAL = 1.0 # Seconds between polls while no voice request is in flight; never slower than the original 1s poll
+SCRIPT_PENDING_INTERVAL = 0.1 # Seconds between polls while a request awaits its script
+
+def execute_scripts_timer():
+    # Nothing may escape this callback: Blender silently unregisters a timer that raises,
+    # while _timer_registered would still claim it is running.
+    context = bpy.context
+    needs_redraw = False
+    try:
+        flush_console(context.scene) # Status text the client thread left for the main thread
+        # Drain as many queued scripts as fit in the time budget instead of one per tick
+        deadline = time.monotonic() + SCRIPT_TICK_BUDGET
+        budget = SCRIPT_TICK_MAX
+        while script_queue and budget > 0 and time.monotonic() < deadline:
             try:
-                import sys, os
-                addon_dir = os.path.dirname(os.path.abspath(__file__))
-                if addon_dir not in sys.path: sys.path.insert(0, addon_dir)
-                import blender_voice_client
-                if hasattr(blender_voice_client, 'send_execution_error'):
-                    # Use the original_request_id variable directly
-                    logger.debug(f"Value of original_request_id JUST BEFORE sending error: {original_request_id}")
-                    logger.info(f"Sending execution error details back to server for request {original_request_id}...")
-                    blender_voice_client.send_execution_error(original_request_id, error_type, error_message)
-                else:
-                    # This case should ideally not happen if client is updated
-                    logger.warning("blender_voice_client.send_execution_error function not found.")
-            except Exception as send_err:
-                logger.error(f"Failed to send execution error to server: {send_err}", exc_info=True)
-            # --- End error sending ---
-
-            # Always add to history
-            entry = {
-                'transcription': transcription, 'status': status,
-                'script': script_to_execute, 'timestamp': entry_timestamp,
-                'starred': False # New entries are never starred by default
-            }
-            command_history.append(entry)
-            logger.debug(f"Appended to command_history: {entry}")
+                popped_item = script_queue.popleft()
+            except IndexError:
+                # This handles the case where the queue becomes empty between the 'while script_queue' check and the pop attempt.
+                logger.debug("execute_scripts_timer: Queue was empty when pop was attempted (potential race condition).")
+                break
+            budget -= 1
             needs_redraw = True
-            # Removed redundant check for transcription before adding to history
-
-    # Removed the extra check here as the try/except around pop handles it
-    if needs_redraw: # Only redraw if we actually processed something
-        logger.debug("Tagging UI for redraw.")
-        for window in context.window_manager.windows:
-            for area in window.screen.areas:
-                if area.type == 'VIEW_3D':
-                    for region in area.regions:
-                        if region.type == 'UI':
-                            region.tag_redraw()
-    return 1.0 # Increased timer interval to 1 second
+            try:
+                execute_queued_script(context, *popped_item)
+            except Exception:
+                logger.error("Failed to run queued item %.200r", popped_item, exc_info=True)
+
+        if needs_redraw: # Only redraw if we actually processed something
+            logger.debug("Tagging UI for redraw.")
+            tag_ui_redraw(context)
+    except Exception:
+        logger.error("execute_scripts_timer failed", exc_info=True)
+    if script_queue:
+        return 0.0 # The budget ran out with scripts still waiting: run again right away
+    if _script_in_flight:
+        return SCRIPT_PENDING_INTERVAL # A context request was answered, so a script should follow shortly
+    return SCRIPT_IDLE_INTERVAL
+
+def ensure_script_timer():
+    """Register execute_scripts_timer unless it is already running.
+
+    Main thread only: Blender's timer list isn't thread-safe, so the voice client thread
+    just appends to script_queue and this timer, started with the client, keeps polling it.
+    """
+    global _timer_registered
+    if not _timer_registered:
+        # Persistent so loading a .blend can't drop it behind the _timer_registered flag's back.
+        bpy.app.timers.register(execute_scripts_timer, first_interval=0.0, persistent=True)
+        _timer_registered = True
+
+def stop_script_timer():
+    global _timer_registered
+    if _timer_registered and bpy.app.timers.is_registered(execute_scripts_timer):
+        bpy.app.timers.unregister(execute_scripts_timer)
+    _timer_registered = False
 
 # --- Operators ---
 class BLENDER_OT_voice_command(bpy.types.Operator):
     bl_idname = "wm.voice_command"
     bl_label = "Start Voice Command"
 
+    _timer = None
+    _result_queue = None
+    validating = False # Class-level, not a scene property, so a .blend saved mid-check can't keep Start disabled
+
     def validate_api_key(self, api_key):
-        """Checks if the provided Gemini API key is valid by making a simple request."""
+        """Synchronously validate the key, reporting any failure on this operator."""
+        is_valid, error_msg = check_api_key(api_key)
+        if not is_valid:
+            self.report({'ERROR'}, error_msg)
+        return is_valid
+
+    def validation_failed(self, context):
+        update_console(context, "API key validation failed.")
+        context.scene.voice_command_props.is_listening = False
+        return {'CANCELLED'}
+
+    def invoke(self, context, event):
+        props = context.scene.voice_command_props
+        if not props.api_key:
+            # Only the active scene was seeded at startup; other scenes take the key from .env on first use
+            props.api_key = env_api_key() or ""
+        if not props.api_key:
+            self.report({'ERROR'}, "Please enter your Gemini API key first")
+            return {'CANCELLED'}
+        if BLENDER_OT_voice_command.validating:
+            return {'CANCELLED'} # An earlier click is still validating; it will start the client
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-            response = requests.get(url)
-            if response.status_code == 200: return True
-            else:
-                error_msg = response.json().get('error', {}).get('message', 'Unknown API error')
-                logger.error(f"API key validation failed: {error_msg} (Status code: {response.status_code})")
-                self.report({'ERROR'}, f"API Key Validation Failed: {error_msg}")
-                return False
-        except requests.exceptions.RequestException as e:
-             logger.error(f"API key validation failed due to network error: {str(e)}", exc_info=True)
-             self.report({'ERROR'}, f"Network Error during API Key Validation: {e}")
-             return False
+            update_env_file(props.api_key)
+            if is_api_key_cached(props.api_key):
+                return self.start_listening(context)
+            # Validate on a worker thread so a slow network doesn't freeze Blender; modal() picks up the result
+            update_console(context, "Validating API key...")
+            self._result_queue = queue.Queue()
+            threading.Thread(target=probe_api_key, args=(props.api_key, self._result_queue), daemon=True).start()
+            wm = context.window_manager
+            self._timer = wm.event_timer_add(KEY_VALIDATION_POLL_INTERVAL, window=context.window)
+            wm.modal_handler_add(self)
+            BLENDER_OT_voice_command.validating = True
+            tag_ui_redraw(context)
+            return {'RUNNING_MODAL'}
         except Exception as e:
-            logger.error(f"Unexpected error during API key validation: {str(e)}", exc_info=True)
-            self.report({'ERROR'}, f"Unexpected Error during API Key Validation: {e}")
-            return False
+            return self.start_failed(context, e)
+
+    def modal(self, context, event):
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        try:
+            is_valid, error_msg = self._result_queue.get_nowait()
+        except queue.Empty:
+            return {'PASS_THROUGH'} # Validation still in flight
+        self.end_validation(context)
+        if not is_valid:
+            self.report({'ERROR'}, error_msg)
+            return self.validation_failed(context)
+        return self.start_listening(context)
+
+    def cancel(self, context):
+        # Modal operator aborted (e.g. the file was closed mid-validation): don't leak the event timer
+        self.end_validation(context)
+
+    def end_validation(self, context):
+        if self._timer is None:
+            return # This instance never started a background check
+        context.window_manager.event_timer_remove(self._timer)
+        self._timer = None
+        BLENDER_OT_voice_command.validating = False
+        tag_ui_redraw(context)
 
     def execute(self, context):
+        # Non-interactive path (e.g. called from a script): validate synchronously
         props = context.scene.voice_command_props
+        if not props.api_key:
+            # Only the active scene was seeded at startup; other scenes take the key from .env on first use
+            props.api_key = env_api_key() or ""
         if not props.api_key:
             self.report({'ERROR'}, "Please enter your Gemini API key first")
             return {'CANCELLED'}
         try:
-            import sys, os
-            addon_dir = os.path.dirname(os.path.abspath(__file__))
-            if addon_dir not in sys.path: sys.path.insert(0, addon_dir)
-            import blender_voice_client
             update_env_file(props.api_key)
             update_console(context, "Validating API key...")
             if not self.validate_api_key(props.api_key):
-                update_console(context, "API key validation failed.")
-                props.is_listening = False
-                return {'CANCELLED'}
+                return self.validation_failed(context)
+        except Exception as e:
+            return self.start_failed(context, e)
+        return self.start_listening(context)
+
+    def start_listening(self, context):
+        props = context.scene.voice_command_props
+        try:
+            if blender_voice_client is None:
+                raise ImportError("blender_voice_client module is not available")
             props.is_listening = True
             update_console(context, "Starting voice recognition...")
             success = blender_voice_client.start_client(lambda msg: process_voice_client_message(context, msg))
@@ -416,39 +1054,43 @@ class BLENDER_OT_voice_command(bpy.types.Operator):
                  props.is_listening = False
                  return {'CANCELLED'}
 
-            # Register timer only after successful connection and config send
-            if not bpy.app.timers.is_registered(execute_scripts_timer):
-                bpy.app.timers.register(execute_scripts_timer)
+            # Register timer only after successful connection and config send.
+            ensure_script_timer()
 
             update_console(context, "Client connected and configured. Listening...")
             return {'FINISHED'}
         except Exception as e:
-            props.is_listening = False
-            error_msg = f"Error starting voice command: {str(e)}"
-            logger.error(error_msg, exc_info=True)
-            update_console(context, error_msg)
-            self.report({'ERROR'}, error_msg)
-            return {'CANCELLED'}
+            return self.start_failed(context, e)
+
+    def start_failed(self, context, e):
+        context.scene.voice_command_props.is_listening = False
+        self.end_validation(context)
+        error_msg = f"Error starting voice command: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        update_console(context, error_msg)
+        self.report({'ERROR'}, error_msg)
+        return {'CANCELLED'}
 
 class BLENDER_OT_stop_voice_command(bpy.types.Operator):
     bl_idname = "wm.stop_voice_command"
     bl_label = "Stop Voice Command"
     def execute(self, context):
+        global _script_in_flight
         props = context.scene.voice_command_props
         try:
-            import sys, os
-            addon_dir = os.path.dirname(os.path.abspath(__file__))
-            if addon_dir not in sys.path: sys.path.insert(0, addon_dir)
-            import blender_voice_client
+            if blender_voice_client is None:
+                raise ImportError("blender_voice_client module is not available")
             update_console(context, "Stopping voice recognition...")
             blender_voice_client.stop_client(lambda msg: update_console(context, msg))
-            if bpy.app.timers.is_registered(execute_scripts_timer):
-                bpy.app.timers.unregister(execute_scripts_timer)
+            stop_script_timer()
+            flush_console(context.scene) # Last lines from the client thread (e.g. "Connection closed"); no timer will show them now
+            pending_transcriptions.clear() # No script can arrive for these any more
+            _script_in_flight = False
             props.is_listening = False
             return {'FINISHED'}
         except Exception as e:
             error_msg = f"Error stopping voice recognition client: {str(e)}"
-            logger.error(error_msg, exc_info=True)
+            logger.error(error_msg)
             update_console(context, error_msg)
             self.report({'ERROR'}, error_msg)
             props.is_listening = False
@@ -458,50 +1100,25 @@ class BLENDER_OT_execute_history_command(bpy.types.Operator):
     bl_idname = "wm.execute_history_command"
     bl_label = "Execute History Command"
     bl_options = {'REGISTER', 'UNDO'}
-    history_index: bpy.props.IntProperty(name="History Index")
+    entry_id: bpy.props.IntProperty(name="Entry ID")
     is_starred_execution: bpy.props.BoolProperty(name="Is Starred Execution", default=False) # Flag if run from starred list
 
     @classmethod
     def description(cls, context, properties):
-        try:
-            # Determine if we are looking in history or starred list
-            source_list = starred_commands if properties.is_starred_execution else command_history
-            entry = list(source_list)[properties.history_index] # Adjust index logic if needed for starred
-            return f"Execute: {entry.get('transcription', 'Unknown Command')}"
-        except IndexError:
-            return "Execute command"
+        entry = lookup_entry(properties.entry_id)
+        return f"Execute: {entry.transcription}" if entry is not None else "Execute command"
 
     def execute(self, context):
-        global command_history # Need to modify history for re-run entry
         try:
-            # Determine source list based on flag
-            source_list = starred_commands if self.is_starred_execution else command_history
-            
-            # Adjust index access if starred_commands list is used directly
-            # For simplicity, assume history_index refers to the original index in command_history
-            # We might need a more robust way to link starred items back if history clears
-            
-            # Find the entry in the main history using timestamp if possible, otherwise index
-            entry_to_execute = None
-            if self.is_starred_execution:
-                 # Find by timestamp in main history
-                 starred_entry = starred_commands[self.history_index] # Get starred item
-                 ts = starred_entry.get('timestamp')
-                 hist_idx = find_history_entry_by_timestamp(ts)
-                 if hist_idx != -1:
-                     entry_to_execute = command_history[hist_idx]
-                 else: # Fallback if not found in history (e.g. history cleared)
-                     entry_to_execute = starred_entry # Use the starred entry itself
-            else:
-                 entry_to_execute = list(command_history)[self.history_index]
-
+            # Prefer the live history entry; a starred command still runs from its copy after leaving the history
+            entry_to_execute = lookup_entry(self.entry_id)
 
             if not entry_to_execute:
                  self.report({'ERROR'}, "Could not find command entry to execute.")
                  return {'CANCELLED'}
 
-            script_to_execute = entry_to_execute.get('script')
-            original_transcription = entry_to_execute.get('transcription', 'Unknown Command')
+            script_to_execute = entry_to_execute.script
+            original_transcription = entry_to_execute.transcription
 
             # --- Added Check: Ensure script exists before trying to execute ---
             if not script_to_execute or not script_to_execute.strip():
@@ -512,13 +1129,13 @@ class BLENDER_OT_execute_history_command(bpy.types.Operator):
                 return {'CANCELLED'} # Do not proceed
 
             update_console(context, f"Executing {'starred' if self.is_starred_execution else 'history'} command: {original_transcription}")
-            logger.info(f"Executing {'starred' if self.is_starred_execution else 'history'} script (index {self.history_index}): {original_transcription}")
+            logger.info("Executing %s script (id %d): %s", 'starred' if self.is_starred_execution else 'history', self.entry_id, original_transcription)
             # Add debug log to confirm script content before execution
-            logger.debug(f"Script content for execution:\n---\n{script_to_execute}\n---")
+            logger.debug("Script content for execution:\n---\n%s\n---", script_to_execute)
 
             status = 'Unknown'
             try:
-                exec(script_to_execute, {"bpy": bpy})
+                run_script(script_to_execute) # Re-runs hit the compile/lower caches instead of recompiling
                 status = 'Success (Executed)'
                 update_console(context, "Script executed successfully.")
             except Exception as e:
@@ -531,30 +1148,17 @@ class BLENDER_OT_execute_history_command(bpy.types.Operator):
 
             # Add a NEW entry to the main history, always unstarred
             # Ensure the script is actually passed here
-            new_entry = {
-                'transcription': f"{original_transcription} (Executed)",
-                'status': status,
-                'script': script_to_execute, # Pass the script that was attempted
-                'timestamp': time.time(),
-                'starred': False # Executed commands are never starred by default
-            }
-            command_history.append(new_entry)
-            logger.debug(f"Appended execution attempt to command_history: {new_entry}")
+            new_entry = HistoryEntry(f"{original_transcription} (Executed)", status, script_to_execute) # The script that was attempted
+            add_history_entry(new_entry)
+            logger.debug("Appended execution attempt to command_history: %s", new_entry)
 
             # Force UI redraw
-            for window in context.window_manager.windows:
-                for area in window.screen.areas:
-                    if area.type == 'VIEW_3D':
-                        for region in area.regions:
-                            if region.type == 'UI': region.tag_redraw()
+            tag_ui_redraw(context)
             return {'FINISHED'}
 
-        except IndexError:
-            self.report({'ERROR'}, f"Invalid index: {self.history_index}")
-            return {'CANCELLED'}
         except Exception as e:
             error_msg = f"Error executing command: {str(e)}"
-            logger.error(error_msg, exc_info=True)
+            logger.error(error_msg)
             self.report({'ERROR'}, error_msg)
             return {'CANCELLED'}
 
@@ -563,104 +1167,97 @@ class BLENDER_OT_toggle_star_history_command(bpy.types.Operator):
     bl_idname = "wm.toggle_star_history_command"
     bl_label = "Toggle Starred Status"
     bl_options = {'REGISTER'}
-    history_index: bpy.props.IntProperty(name="History Index") # Index in command_history
+    entry_id: bpy.props.IntProperty(name="Entry ID")
 
     @classmethod
     def description(cls, context, properties):
-        try:
-            entry = list(command_history)[properties.history_index]
-            action = "Unstar" if entry.get('starred', False) else "Star"
-            return f"{action}: {entry.get('transcription', 'Unknown Command')}"
-        except IndexError: return "Toggle Starred Status (Invalid Index)"
-        except Exception: return "Toggle Starred Status"
+        entry = lookup_entry(properties.entry_id)
+        if entry is None:
+            return "Toggle Starred Status (Entry no longer exists)"
+        action = "Unstar" if entry.starred else "Star"
+        return f"{action}: {entry.transcription}"
 
     def execute(self, context):
-        global command_history, starred_commands
         try:
-            history_list = list(command_history)
-            if 0 <= self.history_index < len(history_list):
-                entry = history_list[self.history_index]
-                entry_timestamp = entry.get('timestamp')
-                is_currently_starred = entry.get('starred', False)
-
-                # Toggle starred status in main history entry
-                entry['starred'] = not is_currently_starred
-                action = "Starred" if entry['starred'] else "Unstarred"
-                logger.info(f"{action} history item at index {self.history_index}: {entry.get('transcription', 'N/A')}")
-
-                # Update the separate starred_commands list
-                starred_idx = find_starred_entry_by_timestamp(entry_timestamp)
-                if entry['starred'] and starred_idx == -1: # Star it and not already in starred list
-                    # Add a copy to starred list (only essential info)
-                    starred_commands.append({
-                        'transcription': entry.get('transcription'),
-                        'script': entry.get('script'),
-                        'timestamp': entry_timestamp # Link by timestamp
-                    })
-                    logger.debug(f"Added to starred_commands: {entry.get('transcription')}")
-                elif not entry['starred'] and starred_idx != -1: # Unstar it and was in starred list
-                    removed_starred = starred_commands.pop(starred_idx)
-                    logger.debug(f"Removed from starred_commands: {removed_starred.get('transcription')}")
-
-                # Recreate the main history deque
-                new_history = collections.deque(history_list, maxlen=command_history.maxlen)
-                command_history = new_history
-
-                # Force UI redraw
-                for window in context.window_manager.windows:
-                    for area in window.screen.areas:
-                        if area.type == 'VIEW_3D':
-                            for region in area.regions:
-                                if region.type == 'UI': region.tag_redraw()
-                return {'FINISHED'}
-            else:
-                self.report({'ERROR'}, f"Invalid history index for starring: {self.history_index}")
+            entry = lookup_entry(self.entry_id)
+            if entry is None:
+                self.report({'ERROR'}, f"No history entry with id {self.entry_id} to star")
                 return {'CANCELLED'}
+
+            # History and starred_commands share the entry object, so one flag covers both views
+            now_starred = not entry.starred
+            entry.starred = now_starred
+            action = "Starred" if now_starred else "Unstarred"
+            logger.info("%s history item %d: %s", action, self.entry_id, entry.transcription)
+
+            # Update the separate starred_commands list
+            if now_starred and self.entry_id not in _starred_by_id: # Star it and not already in starred list
+                add_starred_entry(entry) # Same object as the history row, not a copy
+                logger.debug("Added to starred_commands: %s", entry.transcription)
+            elif not now_starred:
+                removed_starred = remove_starred_entry(self.entry_id) # Unstar it if it was in starred list
+                if removed_starred is not None:
+                    logger.debug("Removed from starred_commands: %s", removed_starred.transcription)
+
+            # Force UI redraw
+            tag_ui_redraw(context)
+            return {'FINISHED'}
         except Exception as e:
             error_msg = f"Error toggling star status: {str(e)}"
-            logger.error(error_msg, exc_info=True)
+            logger.error(error_msg)
             self.report({'ERROR'}, error_msg)
             return {'CANCELLED'}
 
+class BLENDER_OT_scroll_history(bpy.types.Operator):
+    bl_idname = "wm.scroll_history"
+    bl_label = "Scroll Command History"
+    bl_description = "Show newer or older history commands"
+    bl_options = {'INTERNAL'}
+    step: bpy.props.IntProperty(name="Step", default=1) # Positive scrolls towards older commands
+
+    def execute(self, context):
+        props = context.scene.voice_command_props
+        max_offset = max(0, len(command_history) - HISTORY_VISIBLE_ROWS)
+        props.history_scroll_offset = min(max(props.history_scroll_offset + self.step, 0), max_offset)
+        tag_ui_redraw(context)
+        return {'FINISHED'}
+
 class BLENDER_OT_delete_history_command(bpy.types.Operator):
     bl_idname = "wm.delete_history_command"
     bl_label = "Delete History Command"
     bl_options = {'REGISTER'}
-    history_index: bpy.props.IntProperty(name="History Index")
+    entry_id: bpy.props.IntProperty(name="Entry ID")
 
     @classmethod
     def description(cls, context, properties):
-        try:
-            entry = list(command_history)[properties.history_index]
-            return f"Remove '{entry.get('transcription', 'Unknown Command')}' from history (Does NOT affect starred status or undo scene changes)"
-        except IndexError: return "Remove command from history (Invalid Index)"
-        except Exception: return "Remove command from history (Does NOT affect starred status or undo scene changes)"
+        entry = _history_by_id.get(properties.entry_id)
+        if entry is None:
+            return "Remove command from history (Entry no longer exists)"
+        return f"Remove '{entry.transcription}' from history (Does NOT affect starred status or undo scene changes)"
 
     def execute(self, context):
-        global command_history
         try:
-            history_list = list(command_history)
-            if 0 <= self.history_index < len(history_list):
-                removed_entry = history_list.pop(self.history_index)
-                logger.info(f"Removing history item at index {self.history_index}: {removed_entry.get('transcription', 'N/A')}")
-                new_history = collections.deque(history_list, maxlen=command_history.maxlen)
-                command_history = new_history
-                for window in context.window_manager.windows:
-                    for area in window.screen.areas:
-                        if area.type == 'VIEW_3D':
-                            for region in area.regions:
-                                if region.type == 'UI': region.tag_redraw()
-                return {'FINISHED'}
-            else:
-                self.report({'ERROR'}, f"Invalid history index for deletion: {self.history_index}")
+            removed_entry = remove_history_entry(self.entry_id)
+            if removed_entry is None:
+                self.report({'ERROR'}, f"No history entry with id {self.entry_id} to delete")
                 return {'CANCELLED'}
+            logger.info("Removed history item %d: %s", self.entry_id, removed_entry.transcription)
+            tag_ui_redraw(context)
+            return {'FINISHED'}
         except Exception as e:
             error_msg = f"Error deleting history command: {str(e)}"
-            logger.error(error_msg, exc_info=True)
+            logger.error(error_msg)
             self.report({'ERROR'}, error_msg)
             return {'CANCELLED'}
 
 # --- Panel ---
+# Static example lines for the panel's help box
+HELP_EXAMPLES = (
+    "• Create a red cube",
+    "• Add a smooth sphere",
+    "• Move object up 2 units",
+)
+
 class BLENDER_PT_voice_command_panel(bpy.types.Panel):
     bl_label = "Voice Command Panel"
     bl_idname = "BLENDER_PT_voice_command"
@@ -668,6 +1265,31 @@ class BLENDER_PT_voice_command_panel(bpy.types.Panel):
     bl_region_type = "UI"
     bl_category = "Voice"
     
+    @staticmethod
+    def draw_history_row(col, entry):
+        """One history row: the command (runnable if it has a script), then status, star and delete."""
+        # Split straight off the shared column; wrapping each split in its own row only adds a layout level
+        split = col.split(factor=0.75, align=True)
+
+        # Command text/button
+        if entry.script:
+            op = split.operator("wm.execute_history_command", text=entry.transcription, icon=entry.status_icon)
+            op.entry_id = entry.entry_id
+            op.is_starred_execution = False # Executing from main history
+        else:
+            split.label(text=entry.transcription, icon=entry.status_icon)
+
+        # Status label and buttons
+        row_right = split.row(align=True)
+        row_right.alignment = 'RIGHT'
+        row_right.label(text=entry.status_label)
+        # Star button
+        star_op = row_right.operator("wm.toggle_star_history_command", text="", icon='SOLO_ON' if entry.starred else 'SOLO_OFF')
+        star_op.entry_id = entry.entry_id
+        # Delete button
+        del_op = row_right.operator("wm.delete_history_command", text="", icon='TRASH')
+        del_op.entry_id = entry.entry_id
+
     def draw(self, context):
         layout = self.layout
         props = context.scene.voice_command_props
@@ -683,6 +1305,8 @@ class BLENDER_PT_voice_command_panel(bpy.types.Panel):
         status_row.label(text="Status:")
         if props.is_listening:
             status_row.label(text="Listening...", icon="RADIOBUT_ON")
+        elif BLENDER_OT_voice_command.validating:
+            status_row.label(text="Validating API key...", icon="TIME")
         else:
             status_row.label(text="Ready", icon="RADIOBUT_OFF")
         
@@ -696,27 +1320,26 @@ class BLENDER_PT_voice_command_panel(bpy.types.Panel):
         config_row.prop(props, "selected_model")
         config_row.prop(props, "audio_method")
 
-        # Command buttons
-        buttons_row = layout.row(align=True)
-        buttons_row.enabled = bool(props.api_key)
-        buttons_row.scale_y = 2.0
-        
-        # Start button
-        if not props.is_listening:
-            start_btn = buttons_row.operator("wm.voice_command", text="Start Voice Command", icon="REC")
-        # Stop button
-        else:
-            stop_btn = buttons_row.operator("wm.stop_voice_command", text="Stop Voice Command", icon="PAUSE")
-        
-        if not props.api_key:
+        # Command buttons (a disabled row would still be built, so show only the warning without a key)
+        if not (props.api_key or env_api_key(cached_only=True)): # Start seeds an empty key from .env
             layout.label(text="⚠️ Please enter API key first", icon="ERROR")
+        else:
+            buttons_row = layout.row(align=True)
+            buttons_row.scale_y = 2.0
+            # Start button
+            if not props.is_listening:
+                buttons_row.enabled = not BLENDER_OT_voice_command.validating # One validation at a time
+                buttons_row.operator("wm.voice_command", text="Start Voice Command", icon="REC")
+            # Stop button
+            else:
+                buttons_row.operator("wm.stop_voice_command", text="Stop Voice Command", icon="PAUSE")
         
         # Help section
         help_box = layout.box()
-        help_box.label(text="Voice Command Examples:", icon="QUESTION")
-        help_box.label(text="• Create a red cube")
-        help_box.label(text="• Add a smooth sphere")
-        help_box.label(text="• Move object up 2 units")
+        help_box.prop(props, "show_help", text="Voice Command Examples", icon="QUESTION", emboss=False)
+        if props.show_help: # Collapsed by default; the examples rarely need re-reading
+            for example in HELP_EXAMPLES:
+                help_box.label(text=example)
 
 
         # Command History section (Collapsible)
@@ -726,43 +1349,25 @@ class BLENDER_PT_voice_command_panel(bpy.types.Panel):
         # TODO: Add Starred Popup Button Here
         # row.operator("wm.show_starred_popup", text="", icon='SOLO_ON') # Example
 
-        if not props.show_history: # Show only when collapsed
+        if props.show_history: # Skip building the rows entirely while the section is collapsed
             col = history_box.column(align=True)
             if not command_history:
                 col.label(text="No commands yet.")
             else:
-                # Display ALL entries (newest first)
-                for i, entry in enumerate(reversed(command_history)):
-                    row = col.row(align=True)
-                    status = entry.get('status', 'Unknown')
-                    transcription = entry.get('transcription', 'N/A')
-                    script = entry.get('script')
-                    original_index = len(command_history) - 1 - i # Index in the current deque
-
-                    status_icon = "CHECKMARK" if 'Success' in status else "ERROR" if 'Error' in status or 'Failed' in status else "INFO"
-                    star_icon = 'SOLO_ON' if entry.get('starred', False) else 'SOLO_OFF'
-
-                    # Use split factor to manage layout
-                    split = row.split(factor=0.75) # Adjust factor as needed
-
-                    # Command text/button
-                    if script:
-                        op = split.operator("wm.execute_history_command", text=f"{transcription}", icon=status_icon)
-                        op.history_index = original_index
-                        op.is_starred_execution = False # Executing from main history
-                    else:
-                        split.label(text=f"{transcription}", icon=status_icon)
-
-                    # Status label and buttons
-                    row_right = split.row(align=True)
-                    row_right.alignment = 'RIGHT'
-                    row_right.label(text=f"({status})")
-                    # Star button
-                    star_op = row_right.operator("wm.toggle_star_history_command", text="", icon=star_icon)
-                    star_op.history_index = original_index
-                    # Delete button
-                    del_op = row_right.operator("wm.delete_history_command", text="", icon='TRASH')
-                    del_op.history_index = original_index
+                # Display a window of HISTORY_VISIBLE_ROWS entries (newest first), so draw cost doesn't grow with history
+                rows = newest_history_rows()
+                offset = min(props.history_scroll_offset, max(0, len(rows) - HISTORY_VISIBLE_ROWS))
+                for entry in rows[offset:offset + HISTORY_VISIBLE_ROWS]:
+                    self.draw_history_row(col, entry)
+
+                if len(rows) > HISTORY_VISIBLE_ROWS:
+                    scroll_row = col.row(align=True)
+                    scroll_row.alignment = 'CENTER'
+                    newer_op = scroll_row.operator("wm.scroll_history", text="", icon='TRIA_UP')
+                    newer_op.step = -HISTORY_VISIBLE_ROWS
+                    scroll_row.label(text=f"{offset + 1}-{min(offset + HISTORY_VISIBLE_ROWS, len(rows))} of {len(rows)}")
+                    older_op = scroll_row.operator("wm.scroll_history", text="", icon='TRIA_DOWN')
+                    older_op.step = HISTORY_VISIBLE_ROWS
 
 
         # --- Starred Commands Section (Collapsible) ---
@@ -770,47 +1375,27 @@ class BLENDER_PT_voice_command_panel(bpy.types.Panel):
         row = starred_box.row()
         row.prop(props, "show_starred", text="Starred Commands", icon="SOLO_ON", emboss=False)
 
-        if not props.show_starred: # Show only when collapsed
+        if props.show_starred: # Skip building the rows entirely while the section is collapsed
             col_starred = starred_box.column(align=True)
             if not starred_commands:
                 col_starred.label(text="No starred commands yet.")
             else:
-                # Iterate through the separate starred list
-                for i, entry in enumerate(starred_commands):
+                # Iterate through the separate starred list; entries share their history entry's id
+                for entry in starred_commands:
                     row_starred = col_starred.row(align=True)
-                    transcription = entry.get('transcription', 'N/A')
-                    script = entry.get('script')
-                    entry_timestamp = entry.get('timestamp') # Get timestamp to find original index
-
-                    # Find original index in command_history (needed for execution/unstarring)
-                    # This might be fragile if history clears often. Consider storing index if needed.
-                    original_index = find_history_entry_by_timestamp(entry_timestamp)
-
-                    if script and original_index != -1:
-                         # Execute button (uses original index)
-                        op = row_starred.operator("wm.execute_history_command", text=f"{transcription}", icon='PLAY')
-                        op.history_index = original_index
-                        op.is_starred_execution = True # Mark as starred execution
+                    transcription = entry.transcription
 
-                        # Unstar button (uses original index)
-                        unstar_op = row_starred.operator("wm.toggle_star_history_command", text="", icon='SOLO_ON')
-                        unstar_op.history_index = original_index
-                    elif script: # Script exists but original history entry might be gone
-                         row_starred.label(text=f"{transcription} (History Cleared?)", icon='PLAY')
-                         # Simple remove from starred list operator needed here?
-                         # For now, unstar still works if we pass the index *within starred_commands*
-                         # This requires modifying the toggle operator or adding a new one.
-                         # Let's stick to modifying toggle for now, passing a flag?
-                         # Or maybe store the original index *in* the starred entry?
-                         # Simplest for now: just show unstar, it will fail gracefully if index is bad
-                         unstar_op = row_starred.operator("wm.toggle_star_history_command", text="", icon='SOLO_ON')
-                         unstar_op.history_index = original_index # This index is wrong now...
-                         # TODO: Fix unstarring if original history item is gone.
+                    if entry.script:
+                        # Runs the history entry if it's still there, otherwise the starred copy
+                        op = row_starred.operator("wm.execute_history_command", text=transcription, icon='PLAY')
+                        op.entry_id = entry.entry_id
+                        op.is_starred_execution = True # Mark as starred execution
                     else:
                         row_starred.label(text=f"{transcription} (No Script)", icon='ERROR')
-                        # Unstar button (index might be wrong here too)
-                        unstar_op = row_starred.operator("wm.toggle_star_history_command", text="", icon='SOLO_ON')
-                        unstar_op.history_index = original_index
+
+                    # Unstar button (works whether or not the entry is still in the history)
+                    unstar_op = row_starred.operator("wm.toggle_star_history_command", text="", icon='SOLO_ON')
+                    unstar_op.entry_id = entry.entry_id
 
 
 # --- Registration ---
@@ -821,32 +1406,41 @@ classes = (
     BLENDER_OT_execute_history_command,
     BLENDER_OT_toggle_star_history_command, # Register star operator
     BLENDER_OT_delete_history_command,
+    BLENDER_OT_scroll_history,
     BLENDER_PT_voice_command_panel,
 )
 
+_registered_classes = [] # Classes register() actually registered, in registration order
+ENV_KEY_LOAD_DELAY = 0.1 # Seconds after register() before seeding the api_key from .env
+
+def load_api_key_from_env():
+    """Seed the api_key property from .env. Runs as a one-shot timer so register() doesn't block on disk I/O."""
+    try:
+        api_key = env_api_key()
+        if api_key:
+            # Only the active scene; Start seeds any other scene's empty key from .env when first used
+            scene = getattr(bpy.context, 'scene', None)
+            if scene is None:
+                return ENV_KEY_LOAD_DELAY # Context not settled yet (e.g. mid file load); try again shortly
+            scene.voice_command_props.api_key = api_key
+    except Exception as env_error:
+        logger.error(f"Error loading API key from .env: {str(env_error)}")
+    return None # One-shot timer
+
 def register():
+    start_log_listener()
     try:
         for cls in classes:
-            bpy.utils.register_class(cls)
+            # One bad class shouldn't leave the rest unregistered; unregister() then only undoes what succeeded
+            try:
+                bpy.utils.register_class(cls)
+            except Exception as e:
+                logger.error("Failed to register %s: %s", cls.__name__, e)
+            else:
+                _registered_classes.append(cls)
         bpy.types.Scene.voice_command_props = bpy.props.PointerProperty(type=VoiceCommandProperties)
-        # Attempt to load API key from .env file on registration
-        try:
-            env_path = Path(__file__).parent / '.env'
-            if env_path.exists():
-                with open(env_path, 'r') as file:
-                    content = file.read()
-                    match = re.search(r'GEMINI_API_KEY=([^\n\r]*)', content)
-                    if match and match.group(1) and match.group(1) != 'your_gemini_api_key_here':
-                        try:
-                            if hasattr(bpy.context, 'scene'):
-                                bpy.context.scene.voice_command_props.api_key = match.group(1)
-                            elif hasattr(bpy.data, 'scenes') and bpy.data.scenes:
-                                for scene in bpy.data.scenes:
-                                    scene.voice_command_props.api_key = match.group(1)
-                        except AttributeError:
-                            logger.warning("Could not set API key to scenes - will be loaded from .env when needed")
-        except Exception as env_error:
-            logger.error(f"Error loading API key from .env: {str(env_error)}", exc_info=True)
+        # Load the API key from .env on the next idle tick instead of during addon registration
+        bpy.app.timers.register(load_api_key_from_env, first_interval=ENV_KEY_LOAD_DELAY)
         logger.info("Articulate 3D Add-on registered successfully!")
     except Exception as e:
         logger.critical(f"Error registering Articulate 3D Add-on: {str(e)}", exc_info=True)
@@ -854,12 +1448,22 @@ def register():
 
 def unregister():
     try:
-        for cls in reversed(classes):
-            bpy.utils.unregister_class(cls)
+        # Don't lose a key the user typed right before disabling the addon
+        if bpy.app.timers.is_registered(flush_pending_env_write):
+            bpy.app.timers.unregister(flush_pending_env_write)
+        flush_pending_env_write()
+        for timer in (load_api_key_from_env, flush_console_timer):
+            if bpy.app.timers.is_registered(timer):
+                bpy.app.timers.unregister(timer)
+        stop_script_timer()
+        close_http_session()
+        while _registered_classes:
+            bpy.utils.unregister_class(_registered_classes.pop())
         del bpy.types.Scene.voice_command_props
         logger.info("Articulate 3D Add-on unregistered.")
     except Exception as e:
-        logger.error(f"Error unregistering Articulate 3D Add-on: {str(e)}", exc_info=True)
+        logger.error(f"Error unregistering Articulate 3D Add-on: {str(e)}")
+    stop_log_listener()
 
 if __name__ == "__main__":
     register()
@@ -0,0 +1,489 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import importlib.util
+from pathlib import Path
+
+# Add the project root directory to the Python path
+PROJECT_ROOT = Path(__file__).parent.parent # Define project root relative to tests dir
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# The addon is the package's __init__.py; load it as a plain module (bpy is mocked in conftest.py)
+_spec = importlib.util.spec_from_file_location("articulate3d_addon", PROJECT_ROOT / "__init__.py")
+addon = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(addon)
+
+
+# --- Test Fixtures ---
+@pytest.fixture
+def mock_bpy():
+    """Give run_script a fresh bpy mock so operator calls can be asserted per test."""
+    bpy_mock = MagicMock()
+    with patch.object(addon, 'bpy', bpy_mock), patch.dict(addon.SCRIPT_GLOBALS, {'bpy': bpy_mock}):
+        yield bpy_mock
+
+# --- Tests for lower_script ---
+
+def test_lower_script_literal_arguments():
+    """A single bpy.ops call with literal arguments is lowered to a direct operator call."""
+    lowered = addon.lower_script("import bpy\nbpy.ops.mesh.primitive_cube_add(size=2, location=(0, 0, 1))")
+    assert lowered == (('ops', 'mesh', 'primitive_cube_add'), (), {'size': 2, 'location': (0, 0, 1)})
+
+def test_lower_script_negative_literals():
+    """Negative numbers are unary expressions in the AST but still count as literals."""
+    lowered = addon.lower_script("bpy.ops.transform.translate(value=(-1.5, 0, -2))")
+    assert lowered == (('ops', 'transform', 'translate'), (), {'value': (-1.5, 0, -2)})
+
+def test_lower_script_computed_arguments_not_lowered():
+    """Arguments evaluated at runtime (e.g. math.radians) need the exec path."""
+    assert addon.lower_script("bpy.ops.transform.rotate(value=math.radians(45), orient_axis='Z')") is None
+
+def test_lower_script_aliased_import_not_lowered():
+    """'import bpy as b' binds a different name, so the call can't be resolved statically."""
+    assert addon.lower_script("import bpy as b\nb.ops.mesh.primitive_cube_add()") is None
+
+def test_lower_script_kwargs_unpacking_not_lowered():
+    """**kwargs unpacking has no literal keyword names."""
+    assert addon.lower_script("bpy.ops.mesh.primitive_cube_add(**{'size': 2})") is None
+
+def test_lower_script_multiple_statements_not_lowered():
+    """Anything beyond one operator call (plus 'import bpy') needs the exec path."""
+    script = "bpy.ops.mesh.primitive_cube_add()\nbpy.context.object.name = 'Box'"
+    assert addon.lower_script(script) is None
+
+def test_lower_script_non_operator_call_not_lowered():
+    """Only bpy.ops.<module>.<operator>(...) calls qualify."""
+    assert addon.lower_script("bpy.data.objects.remove(obj)") is None
+
+def test_lower_script_syntax_error_returns_none():
+    """Syntax errors are left for compile_script to raise with the real message."""
+    assert addon.lower_script("bpy.ops.mesh.primitive_cube_add(") is None
+
+# --- Tests for run_script ---
+
+def test_run_script_calls_lowered_operator_directly(mock_bpy):
+    """A lowered script calls the operator without going through compile/exec."""
+    with patch.object(addon, 'compile_script') as mock_compile:
+        addon.run_script("bpy.ops.mesh.primitive_cube_add(size=3)")
+    mock_bpy.ops.mesh.primitive_cube_add.assert_called_once_with(size=3)
+    mock_compile.assert_not_called()
+
+def test_run_script_falls_back_to_compile_script(mock_bpy):
+    """Scripts that can't be lowered are compiled and exec'd with SCRIPT_GLOBALS."""
+    script = "bpy.ops.mesh.primitive_cube_add()\nbpy.ops.transform.rotate(value=math.radians(90))"
+    with patch.object(addon, 'compile_script', wraps=addon.compile_script) as mock_compile:
+        addon.run_script(script)
+    mock_compile.assert_called_once_with(script)
+    mock_bpy.ops.mesh.primitive_cube_add.assert_called_once_with()
+    rotate_kwargs = mock_bpy.ops.transform.rotate.call_args.kwargs
+    assert rotate_kwargs['value'] == pytest.approx(1.5707963)
+
+def test_run_script_exec_globals_do_not_leak(mock_bpy):
+    """Each exec'd script starts from a fresh copy of SCRIPT_GLOBALS."""
+    addon.run_script("leaked_name = 1\nbpy.ops.object.select_all(action='DESELECT')")
+    assert 'leaked_name' not in addon.SCRIPT_GLOBALS
+
+def test_run_script_syntax_error_raises(mock_bpy):
+    """A script that doesn't parse raises from compile_script rather than being ignored."""
+    with pytest.raises(SyntaxError):
+        addon.run_script("bpy.ops.mesh.primitive_cube_add(")
+
+# --- Tests for BufferedFileHandler rotation ---
+
+def _make_handler(log_path, **kwargs):
+    """Handler that only flushes when told to, so tests control exactly when rotation is checked."""
+    handler = addon.BufferedFileHandler(log_path, buffer_size=1024 * 1024, flush_interval=3600, **kwargs)
+    handler.setFormatter(addon.logging.Formatter('%(message)s'))
+    return handler
+
+def _log(handler, text):
+    handler.emit(addon.logging.makeLogRecord({'msg': text, 'levelno': addon.logging.INFO, 'levelname': 'INFO'}))
+
+def test_rotation_only_checked_at_flush(tmp_path):
+    """Crossing max_bytes between flushes doesn't rotate until the buffer is flushed."""
+    log_path = tmp_path / "addon.log"
+    handler = _make_handler(log_path, max_bytes=50, backup_count=2)
+    try:
+        _log(handler, "x" * 100)
+        assert not (tmp_path / "addon.log.1").exists()
+        handler.flush()
+        assert (tmp_path / "addon.log.1").read_text() == "x" * 100 + "\n"
+        assert not log_path.exists() # Fresh file is only created by the next record
+        _log(handler, "after")
+        handler.flush()
+        assert log_path.read_text() == "after\n"
+    finally:
+        handler.close()
+
+def test_rotation_shifts_backups_and_drops_oldest(tmp_path):
+    """log -> log.1 -> log.2, with anything beyond backup_count discarded."""
+    log_path = tmp_path / "addon.log"
+    handler = _make_handler(log_path, max_bytes=10, backup_count=2)
+    try:
+        for text in ("first-record", "second-record", "third-record"):
+            _log(handler, text)
+            handler.flush()
+        assert (tmp_path / "addon.log.1").read_text() == "third-record\n"
+        assert (tmp_path / "addon.log.2").read_text() == "second-record\n"
+        assert not (tmp_path / "addon.log.3").exists()
+    finally:
+        handler.close()
+
+def test_rotation_without_backups_truncates(tmp_path):
+    """backup_count=0 keeps no backups: the log is truncated in place."""
+    log_path = tmp_path / "addon.log"
+    handler = _make_handler(log_path, max_bytes=10, backup_count=0)
+    try:
+        _log(handler, "long enough to rotate")
+        handler.flush()
+        assert log_path.read_text() == ""
+        assert not (tmp_path / "addon.log.1").exists()
+    finally:
+        handler.close()
+
+def test_no_rotation_below_max_bytes(tmp_path):
+    """Records under the cap are appended to the same file."""
+    log_path = tmp_path / "addon.log"
+    handler = _make_handler(log_path, max_bytes=1000, backup_count=2)
+    try:
+        _log(handler, "one")
+        _log(handler, "two")
+        handler.flush()
+        assert log_path.read_text() == "one\ntwo\n"
+        assert not (tmp_path / "addon.log.1").exists()
+    finally:
+        handler.close()
+
+def test_reload_closes_previous_file_handler():
+    """Re-running the module (importlib.reload) closes the previous load's log file."""
+    previous_handler = MagicMock()
+    addon.file_handler = previous_handler
+    _spec.loader.exec_module(addon)
+    previous_handler.close.assert_called_once()
+    assert addon.file_handler is not previous_handler
+
+# --- Tests for the history id indexes ---
+
+@pytest.fixture
+def empty_history():
+    """Start each history test with empty deques and indexes."""
+    for container in (addon.command_history, addon._history_by_id, addon.starred_commands, addon._starred_by_id):
+        container.clear()
+    yield
+    for container in (addon.command_history, addon._history_by_id, addon.starred_commands, addon._starred_by_id):
+        container.clear()
+
+def _add(transcription):
+    entry = addon.HistoryEntry(transcription, 'Success', "bpy.ops.mesh.primitive_cube_add()")
+    addon.add_history_entry(entry)
+    return entry
+
+def test_history_eviction_drops_index_entry(empty_history):
+    """When maxlen evicts the oldest entry, its id leaves the index too."""
+    entries = [_add(f"command {i}") for i in range(addon.command_history.maxlen + 1)]
+    evicted, kept = entries[0], entries[1:]
+    assert addon.lookup_entry(evicted.entry_id) is None
+    assert set(addon._history_by_id) == {entry.entry_id for entry in kept}
+    assert list(addon.command_history) == kept
+
+def test_history_newest_rows_follow_changes(empty_history):
+    """The cached newest-first rows are rebuilt after every add and delete."""
+    first, second = _add("first"), _add("second")
+    assert addon.newest_history_rows() == (second, first)
+    addon.remove_history_entry(second.entry_id)
+    assert addon.newest_history_rows() == (first,)
+
+def test_history_delete_then_lookup(empty_history):
+    """A deleted entry is gone from the deque and the index; deleting again is a no-op."""
+    entry = _add("delete me")
+    assert addon.remove_history_entry(entry.entry_id) is entry
+    assert addon.lookup_entry(entry.entry_id) is None
+    assert entry not in addon.command_history
+    assert addon.remove_history_entry(entry.entry_id) is None
+
+def test_starred_entry_outlives_history_row(empty_history):
+    """A starred entry is still found by id after it leaves command_history."""
+    entry = _add("keep me")
+    entry.starred = True
+    addon.add_starred_entry(entry)
+    addon.remove_history_entry(entry.entry_id)
+    assert addon.lookup_entry(entry.entry_id) is entry
+    assert addon.remove_starred_entry(entry.entry_id) is entry
+    assert addon.lookup_entry(entry.entry_id) is None
+    assert addon.starred_commands == []
+
+def test_starred_entry_survives_eviction(empty_history):
+    """maxlen eviction doesn't touch the starred index."""
+    entry = _add("starred and old")
+    addon.add_starred_entry(entry)
+    for i in range(addon.command_history.maxlen):
+        _add(f"newer {i}")
+    assert entry not in addon.command_history
+    assert addon.lookup_entry(entry.entry_id) is entry
+
+# --- Tests for the script timer interval ---
+
+@pytest.fixture
+def idle_voice_state(empty_history, mock_bpy):
+    """No queued scripts, no pending requests, and a mocked voice client."""
+    addon.script_queue.clear()
+    addon.pending_transcriptions.clear()
+    addon._script_in_flight = False
+    with patch.object(addon, 'blender_voice_client', MagicMock()):
+        yield
+    addon.script_queue.clear()
+    addon.pending_transcriptions.clear()
+    addon._script_in_flight = False
+
+def test_script_timer_returns_to_idle_after_script(idle_voice_state):
+    """request_context speeds the timer up; the client-forwarded script (no request_id) slows it back down."""
+    context = MagicMock()
+    addon.process_voice_client_message(context, {"status": "request_context", "request_id": "r1",
+                                                 "message": "Transcribed command (Whisper): add a cube"})
+    assert addon.execute_scripts_timer() == addon.SCRIPT_PENDING_INTERVAL
+
+    # blender_voice_client drops request_id when forwarding scripts
+    addon.process_voice_client_message(context, {"status": "script", "message": "Received script",
+                                                 "script": "bpy.ops.mesh.primitive_cube_add()", "original_text": None})
+    assert addon.pending_transcriptions == {}
+    assert addon.execute_scripts_timer() == addon.SCRIPT_IDLE_INTERVAL
+    assert addon.command_history[-1].transcription == "add a cube"
+    assert addon.execute_scripts_timer() == addon.SCRIPT_IDLE_INTERVAL
+
+def test_script_timer_returns_to_idle_after_server_error(idle_voice_state):
+    """A server error ends the in-flight request just like a script does."""
+    context = MagicMock()
+    addon.process_voice_client_message(context, {"status": "request_context", "request_id": "r2", "message": "move it"})
+    addon.process_voice_client_message(context, {"status": "error", "request_id": "r2", "message": "quota exceeded"})
+    assert addon.execute_scripts_timer() == addon.SCRIPT_IDLE_INTERVAL
+
+# --- Tests for the console handoff from the client thread ---
+
+def test_update_console_from_client_thread_is_flushed_on_main_thread():
+    """Off the main thread update_console only leaves the text pending; flush_console writes it."""
+    import threading
+    addon._console_state.update(shown="", pending=None)
+    scene = MagicMock()
+    thread = threading.Thread(target=addon.update_console, args=(MagicMock(), "Server: Transcribed: add a cube"))
+    thread.start()
+    thread.join()
+    assert addon._console_state["pending"] == "Server: Transcribed: add a cube"
+    addon.flush_console(scene)
+    assert scene.voice_command_props.console_output == "Server: Transcribed: add a cube"
+    assert addon._console_state["pending"] is None
+
+def test_update_console_keeps_pending_error_over_later_status():
+    """A later status line from the client thread doesn't hide an error that hasn't been shown yet."""
+    import threading
+    addon._console_state.update(shown="", pending=None)
+    def send_lines():
+        addon.update_console(MagicMock(), "Server Error: quota exceeded")
+        addon.update_console(MagicMock(), "Server: ready")
+    thread = threading.Thread(target=send_lines)
+    thread.start()
+    thread.join()
+    assert addon._console_state["pending"] == "Server Error: quota exceeded"
+    addon._console_state["pending"] = None
+
+# --- Tests for .env handling ---
+
+@pytest.fixture
+def env_paths(tmp_path):
+    """Point the addon's .env paths and parse cache at a temp directory."""
+    env_path, example_path = tmp_path / ".env", tmp_path / ".env.example"
+    with patch.object(addon, '_ENV_PATH', env_path), patch.object(addon, '_ENV_EXAMPLE_PATH', example_path), \
+            patch.dict(addon._env_cache, {"mtime": None, "lines": [], "data": {}}):
+        yield env_path, example_path
+
+def test_env_key_parsed_with_spaces_around_equals(env_paths):
+    """'GEMINI_API_KEY = x' is read and rewritten in place rather than duplicated."""
+    env_path, _ = env_paths
+    env_path.write_text("# comment\nGEMINI_API_KEY = old-key\n")
+    assert addon.load_env_file()["data"]["GEMINI_API_KEY"] == "old-key"
+    addon.update_env_file("new-key")
+    assert env_path.read_text() == "# comment\nGEMINI_API_KEY=new-key\n"
+
+# --- Tests for API key validation ---
+
+VALID_KEY = "AIza" + "A" * 35
+
+@pytest.fixture
+def key_cache(tmp_path):
+    """Empty in-memory validation cache persisted to a temp .key_cache.json."""
+    cache_path = tmp_path / ".key_cache.json"
+    with patch.object(addon, '_KEY_CACHE_PATH', cache_path), patch.object(addon, '_key_cache_loaded', False), \
+            patch.dict(addon._key_validation_cache, clear=True):
+        yield cache_path
+
+class FakeRequestException(Exception):
+    pass
+
+class FakeTimeout(FakeRequestException):
+    pass
+
+@pytest.fixture
+def mock_session():
+    """Patch get_http_session with a session whose GET returns a 200 response.
+
+    requests itself may not be installed, so check_api_key's except clauses get stand-in exception types.
+    """
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    fake_requests = MagicMock()
+    fake_requests.exceptions.Timeout = FakeTimeout
+    fake_requests.exceptions.RequestException = FakeRequestException
+    with patch.object(addon, 'get_http_session', return_value=session), patch.object(addon, '_requests', fake_requests):
+        yield session
+
+def test_check_api_key_strips_whitespace_before_sending(key_cache, mock_session):
+    """A pasted key with a trailing newline is validated and sent stripped."""
+    assert addon.check_api_key(VALID_KEY + "\n") == (True, None)
+    assert mock_session.get.call_args.kwargs['params'] == {"key": VALID_KEY}
+    assert addon.is_api_key_cached(VALID_KEY)
+
+def test_env_api_key_ignores_placeholder_and_missing_file(env_paths):
+    """The .env.example placeholder and a missing .env both mean 'no key'."""
+    env_path, _ = env_paths
+    assert addon.env_api_key() is None
+    env_path.write_text(f"GEMINI_API_KEY={addon.ENV_KEY_PLACEHOLDER}\n")
+    assert addon.env_api_key() is None
+    env_path.write_text(f"GEMINI_API_KEY={VALID_KEY}\n")
+    addon._env_cache["mtime"] = None # Same-second rewrite: force a re-read
+    assert addon.env_api_key() == VALID_KEY
+    assert addon.env_api_key(cached_only=True) == VALID_KEY
+
+def test_write_env_file_replaces_atomically(env_paths):
+    """write_env_file replaces .env via .env.tmp and leaves no temp file behind."""
+    env_path, _ = env_paths
+    env_path.write_text("OLD=1\n")
+    with patch.object(addon.os, 'replace', wraps=addon.os.replace) as mock_replace:
+        addon.write_env_file("NEW=1\n")
+    mock_replace.assert_called_once_with(env_path.with_name('.env.tmp'), env_path)
+    assert env_path.read_text() == "NEW=1\n"
+    assert not env_path.with_name('.env.tmp').exists()
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="POSIX permission bits")
+def test_write_env_file_new_file_is_owner_only(env_paths):
+    """A freshly created .env holds the API key, so it starts as 0600."""
+    env_path, _ = env_paths
+    addon.write_env_file("GEMINI_API_KEY=x\n")
+    assert env_path.stat().st_mode & 0o777 == 0o600
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="POSIX permission bits")
+def test_write_env_file_keeps_existing_mode(env_paths):
+    """copymode carries the user's chmod on .env over to the replacement."""
+    env_path, _ = env_paths
+    env_path.write_text("OLD=1\n")
+    env_path.chmod(0o640)
+    addon.write_env_file("NEW=1\n")
+    assert env_path.stat().st_mode & 0o777 == 0o640
+
+def test_write_env_file_failure_removes_temp_file(env_paths):
+    """If the replace fails, .env is untouched and .env.tmp is cleaned up."""
+    env_path, _ = env_paths
+    env_path.write_text("OLD=1\n")
+    with patch.object(addon.os, 'replace', side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            addon.write_env_file("NEW=1\n")
+    assert env_path.read_text() == "OLD=1\n"
+    assert not env_path.with_name('.env.tmp').exists()
+
+def test_update_env_file_bootstraps_from_example(env_paths):
+    """Without .env, the example is copied and its placeholder key replaced; other lines are kept."""
+    env_path, example_path = env_paths
+    example_path.write_text(f"# Example config\nGEMINI_API_KEY={addon.ENV_KEY_PLACEHOLDER}\nOTHER=1\n")
+    addon.update_env_file(VALID_KEY)
+    assert env_path.read_text() == f"# Example config\nGEMINI_API_KEY={VALID_KEY}\nOTHER=1\n"
+
+def test_update_env_file_without_example_writes_basic_file(env_paths):
+    """Without .env or .env.example, a minimal .env holding the key is created."""
+    env_path, _ = env_paths
+    addon.update_env_file(VALID_KEY)
+    assert f"GEMINI_API_KEY={VALID_KEY}\n" in env_path.read_text()
+
+def test_update_env_file_skips_unchanged_key(env_paths):
+    """Re-saving the key already on disk doesn't rewrite .env."""
+    env_path, _ = env_paths
+    env_path.write_text(f"GEMINI_API_KEY={VALID_KEY}\n")
+    with patch.object(addon, 'write_env_file') as mock_write:
+        addon.update_env_file(VALID_KEY)
+    mock_write.assert_not_called()
+
+def test_update_env_file_rewrites_deleted_env(env_paths):
+    """The unchanged-key skip still stats .env, so a file deleted outside Blender is recreated."""
+    env_path, _ = env_paths
+    addon.update_env_file(VALID_KEY)
+    env_path.unlink()
+    addon.update_env_file(VALID_KEY)
+    assert f"GEMINI_API_KEY={VALID_KEY}\n" in env_path.read_text()
+
+def test_check_api_key_caches_sha256_and_skips_network(key_cache, mock_session):
+    """A successful validation is cached by SHA-256 hash; the next check makes no request."""
+    import hashlib
+    assert addon.check_api_key(VALID_KEY) == (True, None)
+    assert hashlib.sha256(VALID_KEY.encode()).hexdigest() in addon._key_validation_cache
+    mock_session.get.reset_mock()
+    assert addon.check_api_key(VALID_KEY) == (True, None)
+    mock_session.get.assert_not_called()
+
+def test_key_cache_persists_hash_only_and_survives_reload(key_cache, mock_session):
+    """.key_cache.json holds only the hash, and a fresh session trusts it without re-validating."""
+    import hashlib
+    addon.check_api_key(VALID_KEY)
+    stored = addon.json.loads(key_cache.read_text())
+    assert list(stored) == [hashlib.sha256(VALID_KEY.encode()).hexdigest()]
+    assert VALID_KEY not in key_cache.read_text()
+
+    # Simulate a Blender restart: empty in-memory cache, file not read yet
+    addon._key_validation_cache.clear()
+    addon._key_cache_loaded = False
+    mock_session.get.reset_mock()
+    assert addon.check_api_key(VALID_KEY) == (True, None)
+    mock_session.get.assert_not_called()
+
+def test_key_cache_entry_expires(key_cache, mock_session):
+    """Entries older than KEY_VALIDATION_TTL are re-validated over the network."""
+    import hashlib
+    stale = addon.time.time() - addon.KEY_VALIDATION_TTL - 1
+    addon._key_validation_cache[hashlib.sha256(VALID_KEY.encode()).hexdigest()] = (True, stale)
+    addon._key_cache_loaded = True
+    assert not addon.is_api_key_cached(VALID_KEY)
+    addon.check_api_key(VALID_KEY)
+    mock_session.get.assert_called_once()
+
+def test_check_api_key_rejects_malformed_key_without_request(key_cache, mock_session):
+    """The GEMINI_KEY_RE format gate fails fast on truncated or foreign keys."""
+    for bad_key in ("", "AIza-too-short", "sk-" + "A" * 36, VALID_KEY + "X"):
+        is_valid, error_msg = addon.check_api_key(bad_key)
+        assert not is_valid and "format" in error_msg
+    mock_session.get.assert_not_called()
+
+def test_check_api_key_streams_with_timeout(key_cache, mock_session):
+    """The GET is streamed with the (connect, read) timeout and the response is always closed."""
+    addon.check_api_key(VALID_KEY)
+    call = mock_session.get.call_args
+    assert call.args == (addon.GEMINI_MODELS_URL,)
+    assert call.kwargs['timeout'] == addon.KEY_VALIDATION_TIMEOUT
+    assert call.kwargs['stream'] is True
+    mock_session.get.return_value.close.assert_called_once()
+
+def test_check_api_key_reports_api_error_and_does_not_cache(key_cache, mock_session):
+    """A non-200 reply surfaces Google's error message and isn't cached."""
+    response = mock_session.get.return_value
+    response.status_code = 400
+    response.json.return_value = {"error": {"message": "API key not valid."}}
+    assert addon.check_api_key(VALID_KEY) == (False, "API Key Validation Failed: API key not valid.")
+    response.close.assert_called_once()
+    assert not addon.is_api_key_cached(VALID_KEY)
+
+def test_check_api_key_timeout(key_cache, mock_session):
+    """A timeout gets its own message rather than the generic network error."""
+    mock_session.get.side_effect = FakeTimeout("read timed out")
+    is_valid, error_msg = addon.check_api_key(VALID_KEY)
+    assert not is_valid and "timed out" in error_msg
+
+def test_check_api_key_network_error(key_cache, mock_session):
+    """Other request failures are reported as network errors."""
+    mock_session.get.side_effect = FakeRequestException("connection refused")
+    is_valid, error_msg = addon.check_api_key(VALID_KEY)
+    assert not is_valid and error_msg.startswith("Network Error")